@@ -0,0 +1,249 @@
+from lighttrace.core.bvh import BinaryBVH
+from lighttrace.core.colors import Colors
+from lighttrace.core.functions import sine, cosine, linear
+from lighttrace.core.geometry import Plane, Sphere
+from lighttrace.core.mesh import Mesh
+from lighttrace.core.scheduler import render_frame
+from lighttrace.core.surface import Surface
+from lighttrace.core.tracer import Tracer
+from lighttrace.core.types import PARAMETER_REGISTRY, AnimatedPoint, AnimatedVector3, CoefficientSet, Light, LightType, Point, Scene, Vector3, Viewport
+from lighttrace.core.volume import Octree
+
+from argparse import ArgumentParser
+from contextlib import redirect_stderr
+from io import StringIO
+from math import cos, pi, sin
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+import json
+import platform
+import random
+import subprocess
+import sys
+import tracemalloc
+
+import numpy as np
+
+# bump whenever a scene or a metric changes meaning, results with different
+# versions are not comparable
+VERSION = 1
+SEED = 1234
+FACTORIES = {"bvh": BinaryBVH, "octree": Octree}
+# metrics where a larger value is worse, used by --compare
+COSTS = ("build_seconds", "seconds_per_frame", "peak_memory_bytes")
+
+SceneFactory = Callable[[int, Callable, int], Tuple[Scene, Viewport]]
+
+
+def orbit(frames: int, factory: Callable, size: int) -> Tuple[Scene, Viewport]:
+    # the scene from main.run, kept here so edits to main.py do not move the numbers
+    coefficients_1 = CoefficientSet(.005, .7, .0001, .1, .09)
+    coefficients_2 = CoefficientSet(.005, .88, .0001, .1, .09)
+    surface_1 = Surface(Colors.MATTE_BLUE, coefficients_1)
+    surface_2 = Surface(Colors.GREY_6, coefficients_2)
+    scene = Scene([], [], background=Colors.BLACK, bvh_factory=factory)
+    R = 600
+    scene.add(
+        Light(LightType.AMBIENT, Colors.GREY_5),
+        Light(LightType.POINT, Colors.MATTE_RED, AnimatedVector3(0, linear(frames)(30, 30), -10)),
+        Light(LightType.POINT, Colors.WHITE, AnimatedVector3(cosine(R, frames)(), 700, sine(R, frames)())),
+        Light(LightType.DIRECTIONAL, Colors.WHITE, Vector3(-1, -1, -1)),
+        Plane(Point(0, -400, 0), Vector3(0, 1, 0), surface=surface_1),
+        Sphere(radius=300, center=Point(0, 0, 0), surface=surface_1),
+        Sphere(radius=70, center=AnimatedPoint(cosine(R, frames)(), 0, sine(R, frames)()), surface=surface_2),
+    )
+    E = 1000
+    origin = AnimatedVector3(sine(E / 2, frames)(), 200, cosine(E, frames)())
+    return scene, Viewport(size, size, origin=origin, up=Vector3(0, 1, 0), focus=Vector3(0, 0, 0), fov=120.0)
+
+
+def sphere_field(n: int) -> SceneFactory:
+    def build(frames: int, factory: Callable, size: int) -> Tuple[Scene, Viewport]:
+        rng = random.Random(SEED + n)
+        surface = Surface(Colors.MATTE_BLUE, CoefficientSet(.005, .7, .0001, .1, .09))
+        scene = Scene([], [], background=Colors.BLACK, bvh_factory=factory)
+        scene.add(
+            Light(LightType.AMBIENT, Colors.GREY_5),
+            Light(LightType.POINT, Colors.WHITE, Vector3(0, 700, 0)),
+            Light(LightType.DIRECTIONAL, Colors.WHITE, Vector3(-1, -1, -1)),
+            Plane(Point(0, -400, 0), Vector3(0, 1, 0), surface=surface),
+        )
+        spread = 300 * (n / 100) ** (1 / 3)
+        for _ in range(n):
+            center = Point(*(rng.uniform(-spread, spread) for _ in range(3)))
+            scene.add(Sphere(radius=rng.uniform(5, 30), center=center, surface=surface))
+        # one sphere crossing the field keeps the per-frame BVH maintenance honest
+        scene.add(Sphere(radius=40, center=AnimatedPoint(linear(frames)(-spread, spread), 0, 0), surface=surface))
+        return scene, Viewport(size, size, origin=Vector3(0, 200, -3 * spread - 400), focus=Vector3(0, 0, 0), fov=90.0)
+    return build
+
+
+def heightfield(cells: int, surface: Surface) -> Mesh:
+    # a cells x cells grid of quads, two triangles each, over a gentle swell
+    mesh = Mesh(surface=surface)
+    x, z = np.meshgrid(np.linspace(-400, 400, cells + 1), np.linspace(-400, 400, cells + 1))
+    y = 60 * np.sin(x / 90) * np.cos(z / 110) - 200
+    mesh.vertices = np.stack([x, y, z], axis=-1).reshape(-1, 3).astype(np.float32)
+    row = np.arange(cells)
+    a = (row[:, None] * (cells + 1) + row[None, :]).ravel()
+    b, c, d = a + 1, a + cells + 1, a + cells + 2
+    mesh.indices = np.concatenate([np.stack([a, c, b], axis=1), np.stack([b, c, d], axis=1)]).astype(np.int32)
+    return mesh
+
+
+def plane_mesh(frames: int, factory: Callable, size: int) -> Tuple[Scene, Viewport]:
+    matte = Surface(Colors.MATTE_BLUE, CoefficientSet(.005, .7, .0001, .1, .09))
+    grey = Surface(Colors.GREY_6, CoefficientSet(.005, .88, .0001, .1, .09))
+    scene = Scene([], [], background=Colors.BLACK, bvh_factory=factory)
+    scene.add(
+        Light(LightType.AMBIENT, Colors.GREY_5),
+        Light(LightType.POINT, Colors.WHITE, AnimatedVector3(cosine(600, frames)(), 700, sine(600, frames)())),
+        Light(LightType.DIRECTIONAL, Colors.WHITE, Vector3(-1, -1, -1)),
+        Plane(Point(0, -400, 0), Vector3(0, 1, 0), surface=matte),
+        *heightfield(32, grey).generate_polygons(),
+    )
+    return scene, Viewport(size, size, origin=Vector3(0, 400, -900), focus=Vector3(0, -200, 0), fov=90.0)
+
+
+def mirrors(frames: int, factory: Callable, size: int) -> Tuple[Scene, Viewport]:
+    # a ring of strongly reflective spheres around a moving one: rays bounce
+    # between the spheres many times before escaping
+    mirror = Surface(Colors.GREY_6, CoefficientSet(.005, .5, .0001, .1, .85))
+    matte = Surface(Colors.MATTE_RED, CoefficientSet(.005, .7, .0001, .1, .09))
+    scene = Scene([], [], background=Colors.GREY_4, bvh_factory=factory)
+    scene.add(
+        Light(LightType.AMBIENT, Colors.GREY_5),
+        Light(LightType.POINT, Colors.WHITE, Vector3(0, 800, -200)),
+        Plane(Point(0, -400, 0), Vector3(0, 1, 0), surface=mirror),
+        Sphere(radius=80, center=AnimatedPoint(0, linear(frames)(-100, 100), 0), surface=matte),
+    )
+    for k in range(8):
+        angle = k * pi / 4
+        scene.add(Sphere(radius=150, center=Point(320 * cos(angle), 0, 320 * sin(angle)), surface=mirror))
+    return scene, Viewport(size, size, origin=Vector3(0, 150, -700), focus=Vector3(0, 0, 0), fov=90.0)
+
+
+def scenes(sizes: List[int]) -> Dict[str, SceneFactory]:
+    suite = {"orbit": orbit}
+    suite.update((f"spheres_{n}", sphere_field(n)) for n in sizes)
+    suite.update(plane_mesh=plane_mesh, mirrors=mirrors)
+    return suite
+
+
+def build(factory: SceneFactory, frames: int, bvh: str, resolution: int) -> Tuple[Scene, Viewport]:
+    PARAMETER_REGISTRY.clear()
+    return factory(frames, FACTORIES[bvh], resolution)
+
+
+def measure(factory: SceneFactory, frames: int, bvh: str, resolution: int, repeat: int) -> Dict[str, float]:
+    scene, viewport = build(factory, frames, bvh, resolution)
+    with redirect_stderr(StringIO()):
+        start = perf_counter()
+        scene.construct()
+        build_seconds = perf_counter() - start
+
+        # the fastest of `repeat` renders is the least disturbed by whatever
+        # else the machine is doing
+        times = []
+        for frame in range(frames):
+            snapshot = scene.snapshot(frame)
+            best = float("inf")
+            for _ in range(repeat):
+                start = perf_counter()
+                render_frame(scene, viewport, Tracer.trace_pixel, snapshot)
+                best = min(best, perf_counter() - start)
+            times.append(best)
+
+    # memory is traced in a separate pass, tracemalloc slows everything down
+    scene, viewport = build(factory, frames, bvh, resolution)
+    with redirect_stderr(StringIO()):
+        tracemalloc.start()
+        render_frame(scene, viewport, Tracer.trace_pixel, scene.snapshot(0))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    pixels = resolution * resolution
+    return {
+        "objects": len(scene.objects),
+        "build_seconds": build_seconds,
+        "frame_seconds": times,
+        "seconds_per_frame": sum(times) / len(times),
+        "primary_rays_per_second": pixels * len(times) / sum(times),
+        "peak_memory_bytes": peak,
+    }
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(old: dict, new: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in new["scenes"].items():
+        before = old["scenes"].get(name)
+        if before is None:
+            continue
+        for metric in COSTS:
+            ratio = result[metric] / before[metric] if before[metric] else 1.0
+            flag = "  REGRESSION" if ratio > 1 + tolerance else ""
+            print(f"{name:>16} {metric:>20} {before[metric]:>14.4g} -> {result[metric]:<14.4g} x{ratio:.2f}{flag}", file=sys.stderr)
+            if flag:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def main() -> int:
+    parser = ArgumentParser(description="render the benchmark scenes and report timings as JSON")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="a previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slowdown before a metric counts as a regression")
+    parser.add_argument("--scenes", nargs="*", help="only run these scenes")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 100, 1000], help="sphere counts for the sphere fields")
+    parser.add_argument("--frames", type=int, default=3)
+    parser.add_argument("--resolution", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3, help="renders per frame, the fastest is kept")
+    parser.add_argument("--bvh", choices=sorted(FACTORIES), default="bvh")
+    args = parser.parse_args()
+
+    report = {
+        "version": VERSION,
+        "revision": revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "bvh": args.bvh,
+        "frames": args.frames,
+        "resolution": args.resolution,
+        "repeat": args.repeat,
+        "scenes": {},
+    }
+    for name, factory in scenes(args.sizes).items():
+        if args.scenes and name not in args.scenes:
+            continue
+        report["scenes"][name] = measure(factory, args.frames, args.bvh, args.resolution, args.repeat)
+        print(f"{name}: {report['scenes'][name]['seconds_per_frame']:.3f}s/frame", file=sys.stderr)
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(encoded)
+    else:
+        print(encoded)
+
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text())
+        if old.get("version") != VERSION:
+            print("reports come from different benchmark versions", file=sys.stderr)
+            return 1
+        if compare(old, report, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
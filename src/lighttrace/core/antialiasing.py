@@ -0,0 +1,97 @@
+from .types import Color, Scene, Vector3, Viewport
+
+from typing import Callable, Dict, List, Tuple
+
+RayTracer = Callable[[Scene, Vector3, Vector3], Color]
+
+THRESHOLD = 16.0
+DEPTH = 2
+
+
+def contrast(a: Color, b: Color) -> float:
+    return max(abs(a.i - b.i), abs(a.j - b.j), abs(a.k - b.k))
+
+
+def average(colors: List[Color]) -> Color:
+    res = Color()
+    for c in colors:
+        res += c
+    return res * (1. / len(colors))
+
+
+class AdaptiveSampler:
+    def __init__(
+        self,
+        viewport: Viewport,
+        scene: Scene,
+        trace_ray: RayTracer,
+        threshold: float = THRESHOLD,
+        depth: int = DEPTH,
+    ) -> None:
+        self.viewport = viewport
+        self.scene = scene
+        self.trace_ray = trace_ray
+        self.threshold = threshold
+        self.depth = depth
+        # samples live on an integer lattice with `scale` steps per pixel, so
+        # a corner shared by neighbouring pixels (or sub-squares) has a single
+        # key and is only traced once
+        self.scale = 2 ** (depth + 1)
+        self.__samples: Dict[Tuple[int, int], Color] = {}
+
+    @property
+    def samples(self) -> int:
+        return len(self.__samples)
+
+    def sample(self, x: int, y: int) -> Color:
+        color = self.__samples.get((x, y))
+        if color is None:
+            _, _, du, dv, vp = self.viewport
+            i, j = x / self.scale, y / self.scale
+            d = Vector3(
+                i=(i * du.i + j * dv.i + vp.i),
+                j=(i * du.j + j * dv.j + vp.j),
+                k=(i * du.k + j * dv.k + vp.k),
+            )
+            color = self.__samples[(x, y)] = self.trace_ray(self.scene, self.viewport.origin, d)
+        return color
+
+    def render(self, progress: Callable[[float], None] = None) -> List[List[Color]]:
+        width, height = self.viewport.width, self.viewport.height
+        s = self.scale
+
+        # one sample through every pixel centre first
+        pixels = [[self.sample(i * s, j * s) for i in range(width)] for j in range(height)]
+
+        # then refine every pixel that differs too much from a neighbour
+        edges = set()
+        for j in range(height):
+            for i in range(width):
+                c = pixels[j][i]
+                if i + 1 < width and contrast(c, pixels[j][i + 1]) > self.threshold:
+                    edges.update(((i, j), (i + 1, j)))
+                if j + 1 < height and contrast(c, pixels[j + 1][i]) > self.threshold:
+                    edges.update(((i, j), (i, j + 1)))
+
+        for done, (i, j) in enumerate(sorted(edges, key=lambda p: (p[1], p[0])), 1):
+            pixels[j][i] = self.__refine(i * s - s // 2, j * s - s // 2, s, 0)
+            if progress is not None:
+                progress(done * 100 / len(edges))
+        return pixels
+
+    def __refine(self, x0: int, y0: int, size: int, level: int) -> Color:
+        h = size // 2
+        samples = [
+            self.sample(x0, y0),
+            self.sample(x0 + size, y0),
+            self.sample(x0, y0 + size),
+            self.sample(x0 + size, y0 + size),
+            self.sample(x0 + h, y0 + h),
+        ]
+        if level < self.depth and max(contrast(samples[4], c) for c in samples[:4]) > self.threshold:
+            return average([
+                self.__refine(x0 + dx, y0 + dy, h, level + 1)
+                for dy in (0, h)
+                for dx in (0, h)
+            ])
+        return average(samples)
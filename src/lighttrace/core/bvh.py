@@ -0,0 +1,466 @@
+from .constants import INFINITY
+from .packet import DIVERGED, Packet
+from .ray import Ray
+from .types import BoundingVolumeHierarchy, Bounds, SceneObject
+from .volume import Volume
+
+from array import array
+from heapq import heapify, heappop, heappush
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+BINS = 12
+MAX_LEAF_SIZE = 4
+TRAVERSAL_COST = 1.0
+INTERSECTION_COST = 1.0
+# refitting stops once the SAH cost grows past this multiple of the built cost
+REBUILD_THRESHOLD = 1.5
+
+Box = Tuple[float, float, float, float, float, float]
+EMPTY_BOX = (INFINITY, INFINITY, INFINITY, -INFINITY, -INFINITY, -INFINITY)
+
+
+def union(a: Box, b: Box) -> Box:
+    return (
+        min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]),
+        max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]),
+    )
+
+
+def bounding_box(boxes: List[Box]) -> Box:
+    if not boxes:
+        return EMPTY_BOX
+    columns = tuple(zip(*boxes))
+    return (
+        min(columns[0]), min(columns[1]), min(columns[2]),
+        max(columns[3]), max(columns[4]), max(columns[5]),
+    )
+
+
+def surface_area(b: Box) -> float:
+    di, dj, dk = b[3] - b[0], b[4] - b[1], b[5] - b[2]
+    if di < 0 or dj < 0 or dk < 0:
+        return 0.0
+    return 2 * (di * dj + dj * dk + dk * di)
+
+
+def to_box(volume: Volume) -> Box:
+    i, j, k = volume
+    return (i.min, j.min, k.min, i.max, j.max, k.max)
+
+
+def _interval_culler(anchors: np.ndarray, inverse: np.ndarray) -> Optional[Callable[[array, int], bool]]:
+    # interval arithmetic over the whole packet: a box is missed by every ray
+    # once the earliest any ray can enter it comes after the latest any ray
+    # can leave it. only for packets whose directions agree in sign.
+    lo, hi = inverse.min(axis=0), inverse.max(axis=0)
+    if not np.isfinite(lo).all() or not np.isfinite(hi).all() or ((lo < 0) & (hi > 0)).any():
+        return None
+    # per axis: the offsets of the near and far box faces, and the bounds of
+    # the anchors and inverse directions
+    axes = [
+        ((3, 0) if h < 0 else (0, 3), ol, oh, l, h)
+        for (ol, oh, l, h), axis in zip(zip(anchors.min(axis=0).tolist(), anchors.max(axis=0).tolist(), lo.tolist(), hi.tolist()), range(3))
+    ]
+    axes = [((near + axis, far + axis), ol, oh, l, h) for axis, ((near, far), ol, oh, l, h) in enumerate(axes)]
+
+    def cull(boxes: array, b: int) -> bool:
+        enter, leave = -INFINITY, INFINITY
+        for (near, far), ol, oh, l, h in axes:
+            # the products of the ends of the two intervals bound (face - o) * inv
+            x, y = boxes[b + near] - oh, boxes[b + near] - ol
+            t = min(x * l, x * h, y * l, y * h)
+            if t > enter:
+                enter = t
+            x, y = boxes[b + far] - oh, boxes[b + far] - ol
+            t = max(x * l, x * h, y * l, y * h)
+            if t < leave:
+                leave = t
+        return enter > leave or leave < 0
+    return cull
+
+
+class BinaryBVH(BoundingVolumeHierarchy):
+    # the traversal stack; stats.start swaps in one that counts visited nodes
+    Stack = list
+
+    def __init__(self, objects: List[SceneObject]) -> None:
+        # nodes are stored depth-first: an interior node's left child directly
+        # follows it, `offsets` holds the index of its right child. leaves store
+        # the offset of their first object in `objects` and a non-zero count.
+        self.boxes = array("d")
+        self.offsets = array("i")
+        self.counts = array("i")
+        self.axes = array("b")
+        self.objects: List[SceneObject] = []
+        self.__parents: array = None
+        self.__leaves_of: array = None
+        self.__slots: Dict[int, int] = None
+        self.__cost = 0.0
+        self.__built_cost = 0.0
+        self.__end_boxes: array = None
+        self.__boxes_at: Dict[float, array] = {}
+
+        if objects:
+            boxes = [to_box(o.bounds) for o in objects]
+            centroids = [((b[0] + b[3]) / 2, (b[1] + b[4]) / 2, (b[2] + b[5]) / 2) for b in boxes]
+            order = list(range(len(objects)))
+            self.__build(order, 0, len(order), boxes, centroids)
+            self.objects = [objects[idx] for idx in order]
+
+    @classmethod
+    def restore(cls, objects: List[SceneObject], boxes: array, offsets: array, counts: array, axes: array) -> "BinaryBVH":
+        # rebuild from previously built node arrays; `objects` must already be
+        # in the hierarchy's leaf order
+        bvh = cls([])
+        bvh.boxes, bvh.offsets, bvh.counts, bvh.axes = boxes, offsets, counts, axes
+        bvh.objects = list(objects)
+        return bvh
+
+    def __add_node(self, box: Box) -> int:
+        node = len(self.counts)
+        self.boxes.extend(box)
+        self.offsets.append(0)
+        self.counts.append(0)
+        self.axes.append(0)
+        return node
+
+    def __build(self, order: List[int], start: int, stop: int, boxes: List[Box], centroids: List[Tuple[float, float, float]]) -> int:
+        box = bounding_box([boxes[idx] for idx in order[start:stop]])
+        cbox = bounding_box([centroids[idx] * 2 for idx in order[start:stop]])
+        node = self.__add_node(box)
+
+        n = stop - start
+        split = self.__find_split(order, start, stop, boxes, centroids, box, cbox) if n > 1 else None
+        if split is None:
+            self.offsets[node] = start
+            self.counts[node] = n
+            return node
+
+        axis, lo, scale, threshold = split
+        left, right = [], []
+        for idx in order[start:stop]:
+            if int((centroids[idx][axis] - lo) * scale) < threshold:
+                left.append(idx)
+            else:
+                right.append(idx)
+        order[start:stop] = left + right
+        mid = start + len(left)
+
+        self.axes[node] = axis
+        self.__build(order, start, mid, boxes, centroids)
+        self.offsets[node] = self.__build(order, mid, stop, boxes, centroids)
+        return node
+
+    def __find_split(self, order, start, stop, boxes, centroids, box, cbox):
+        n = stop - start
+        leaf_cost = n * INTERSECTION_COST
+        parent_area = surface_area(box)
+        best = None
+        best_cost = leaf_cost if n <= MAX_LEAF_SIZE else INFINITY
+        bins_count = min(BINS, n)
+
+        for axis in range(3):
+            lo, hi = cbox[axis], cbox[axis + 3]
+            if hi - lo <= 0:
+                continue
+            scale = bins_count / (hi - lo)
+            members = [[] for _ in range(bins_count)]
+            for idx in order[start:stop]:
+                members[min(bins_count - 1, int((centroids[idx][axis] - lo) * scale))].append(boxes[idx])
+            counts = [len(m) for m in members]
+            bins = [bounding_box(m) for m in members]
+
+            # sweep from the right to collect the area of every suffix of bins
+            right_area = [0.0] * bins_count
+            right_count = [0] * bins_count
+            acc_box, acc_count = EMPTY_BOX, 0
+            for b in range(bins_count - 1, 0, -1):
+                acc_box = union(acc_box, bins[b])
+                acc_count += counts[b]
+                right_area[b] = surface_area(acc_box)
+                right_count[b] = acc_count
+
+            acc_box, acc_count = EMPTY_BOX, 0
+            for b in range(1, bins_count):
+                acc_box = union(acc_box, bins[b - 1])
+                acc_count += counts[b - 1]
+                if not acc_count or not right_count[b]:
+                    continue
+                cost = TRAVERSAL_COST + INTERSECTION_COST * (
+                    acc_count * surface_area(acc_box) + right_count[b] * right_area[b]
+                ) / parent_area
+                if cost < best_cost:
+                    best_cost = cost
+                    best = (axis, lo, scale, b)
+        return best
+
+    def __index(self) -> None:
+        # parent links, object -> leaf lookup and the SAH cost of the tree as
+        # built; only needed once the hierarchy starts being refit
+        n = len(self.counts)
+        self.__parents = array("i", [-1]) * n
+        self.__leaves_of = array("i", [0]) * len(self.objects)
+        self.__slots = {id(o): slot for slot, o in enumerate(self.objects)}
+        for node in range(n):
+            count = self.counts[node]
+            if count:
+                offset = self.offsets[node]
+                self.__leaves_of[offset:offset + count] = array("i", [node]) * count
+            else:
+                self.__parents[node + 1] = node
+                self.__parents[self.offsets[node]] = node
+        self.__cost = sum(self.__weight(node) * surface_area(self.__box(node)) for node in range(n))
+        self.__built_cost = self.__relative_cost()
+
+    def __getstate__(self) -> dict:
+        # the refit index is keyed by object id, which does not survive pickling
+        state = self.__dict__.copy()
+        state.update(_BinaryBVH__parents=None, _BinaryBVH__leaves_of=None, _BinaryBVH__slots=None)
+        return state
+
+    def __box(self, node: int) -> Box:
+        return tuple(self.boxes[6 * node:6 * node + 6])
+
+    def __weight(self, node: int) -> float:
+        count = self.counts[node]
+        return count * INTERSECTION_COST if count else TRAVERSAL_COST
+
+    def __relative_cost(self) -> float:
+        area = surface_area(self.__box(0))
+        return self.__cost / area if area else 0.0
+
+    def refit(self, objects: List[SceneObject]) -> bool:
+        changes = self.__propagate(self.boxes, objects, 0.0)
+        if changes is None:
+            return False
+        for node, old, box in changes:
+            self.__cost += self.__weight(node) * (surface_area(box) - surface_area(old))
+        # boxes at shutter close no longer match the refit ones
+        self.__end_boxes = None
+        self.__boxes_at.clear()
+        return self.__relative_cost() <= REBUILD_THRESHOLD * self.__built_cost
+
+    def move(self, objects: List[SceneObject]) -> bool:
+        # node boxes at shutter close; a ray at time t is tested against boxes
+        # interpolated between the two, which bound every object in between
+        # since objects move linearly over the shutter
+        self.__boxes_at.clear()
+        if not objects:
+            self.__end_boxes = None
+            return True
+        self.__end_boxes = array("d", self.boxes)
+        if self.__propagate(self.__end_boxes, objects, 1.0) is None:
+            self.__end_boxes = None
+            return False
+        return True
+
+    def __propagate(self, boxes: array, objects: List[SceneObject], time: float) -> Optional[List[Tuple[int, Box, Box]]]:
+        # recompute the boxes of the leaves holding `objects` and of their
+        # ancestors; returns the changed nodes, or None for unknown objects
+        if not self.counts:
+            return None
+        if self.__parents is None:
+            self.__index()
+
+        pending = []
+        for o in objects:
+            slot = self.__slots.get(id(o))
+            if slot is None:
+                return None
+            pending.append(-self.__leaves_of[slot])
+        queued = set(pending)
+        heapify(pending)
+
+        # children always follow their parent in depth-first order, so popping
+        # the highest node first refits every child before its parent
+        offsets, counts, parents = self.offsets, self.counts, self.__parents
+        changes = []
+        while pending:
+            node = -heappop(pending)
+            count = counts[node]
+            if count:
+                offset = offsets[node]
+                box = bounding_box([to_box(o.bounds_at(time)) for o in self.objects[offset:offset + count]])
+            else:
+                left, right = 6 * (node + 1), 6 * offsets[node]
+                box = union(tuple(boxes[left:left + 6]), tuple(boxes[right:right + 6]))
+
+            old = tuple(boxes[6 * node:6 * node + 6])
+            if box == old:
+                continue
+            boxes[6 * node:6 * node + 6] = array("d", box)
+            changes.append((node, old, box))
+
+            parent = parents[node]
+            if parent >= 0 and -parent not in queued:
+                queued.add(-parent)
+                heappush(pending, -parent)
+        return changes
+
+    def __interpolated(self, time: float) -> array:
+        boxes = self.__boxes_at.get(time)
+        if boxes is None:
+            start = np.frombuffer(self.boxes, dtype=np.float64)
+            end = np.frombuffer(self.__end_boxes, dtype=np.float64)
+            boxes = self.__boxes_at[time] = array("d", (start + (end - start) * time).tobytes())
+        return boxes
+
+    @property
+    def size(self) -> int:
+        return sum(1 for c in self.counts if c)
+
+    @property
+    def bounds(self) -> Volume:
+        b = self.boxes[:6] if len(self.counts) else EMPTY_BOX
+        return Volume(i=Bounds(b[0], b[3]), j=Bounds(b[1], b[4]), k=Bounds(b[2], b[5]))
+
+    def __leaves(self, ray: Ray, root: int = 0):
+        if not self.counts:
+            return
+        anchor, inverse = ray.anchor, ray.direction.inverse
+        ai, aj, ak = anchor.i, anchor.j, anchor.k
+        ii, ij, ik = inverse.i, inverse.j, inverse.k
+        negative = (ii < 0, ij < 0, ik < 0)
+        # per axis, the offset of the box face the ray enters through and the
+        # one it leaves by, so the slab test needs no min/max pairs
+        ni, fi = (3, 0) if ii < 0 else (0, 3)
+        nj, fj = (4, 1) if ij < 0 else (1, 4)
+        nk, fk = (5, 2) if ik < 0 else (2, 5)
+        boxes = self.boxes
+        if ray.time and self.__end_boxes is not None:
+            boxes = self.__interpolated(ray.time)
+        offsets, counts, axes = self.offsets, self.counts, self.axes
+
+        stack = self.Stack((root,))
+        while stack:
+            node = stack.pop()
+            b = 6 * node
+            tmin = (boxes[b + ni] - ai) * ii
+            tmax = (boxes[b + fi] - ai) * ii
+            t = (boxes[b + nj] - aj) * ij
+            if t > tmin:
+                tmin = t
+            t = (boxes[b + fj] - aj) * ij
+            if t < tmax:
+                tmax = t
+            t = (boxes[b + nk] - ak) * ik
+            if t > tmin:
+                tmin = t
+            t = (boxes[b + fk] - ak) * ik
+            if t < tmax:
+                tmax = t
+            if tmax < 0 or tmax < tmin or tmin > ray.t:
+                continue
+
+            count = counts[node]
+            if count:
+                yield offsets[node], count
+            elif negative[axes[node]]:
+                stack.append(node + 1)
+                stack.append(offsets[node])
+            else:
+                stack.append(offsets[node])
+                stack.append(node + 1)
+
+    def __packet_leaves(self, packet: Packet):
+        # the boxes of both children of a node are tested at once against all
+        # the rays of the packet that reached the node, and each child only
+        # gets the rays that hit it; rays reaching a leaf come with it. once
+        # few enough rays are left the rest of the subtree is walked one ray
+        # at a time.
+        if not self.counts:
+            return
+        flat = self.boxes
+        if packet.time and self.__end_boxes is not None:
+            flat = self.__interpolated(packet.time)
+        boxes = np.frombuffer(flat, dtype=np.float64).reshape(-1, 6)
+        offsets, counts, axes = self.offsets, self.counts, self.axes
+        anchors, inverse, t, done = packet.anchors, packet.inverse, packet.t, packet.done
+        cull = _interval_culler(anchors, inverse)
+        # children are visited nearest first for most of the rays
+        negative = (2 * np.count_nonzero(packet.directions < 0, axis=0) > len(packet)).tolist()
+        # a ray lying in a slab plane gets nan there (0 * inf - 0 * inf),
+        # which like in the single-ray test does not cull it
+        degenerate = np.isinf(inverse).any()
+        with np.errstate(invalid="ignore"):
+            offset = anchors * inverse
+
+        def hits(nodes: Tuple[int, ...], idx: np.ndarray) -> np.ndarray:
+            inv, off = inverse[idx], offset[idx]
+            b = boxes[nodes, None]
+            if degenerate:
+                with np.errstate(invalid="ignore"):
+                    near = b[..., :3] * inv - off
+                    far = b[..., 3:] * inv - off
+                    tmin = np.fmax.reduce(np.minimum(near, far), axis=2)
+                    tmax = np.fmin.reduce(np.maximum(near, far), axis=2)
+            else:
+                near = b[..., :3] * inv - off
+                far = b[..., 3:] * inv - off
+                tmin = np.minimum(near, far).max(axis=2)
+                tmax = np.maximum(near, far).min(axis=2)
+            return (tmax >= np.maximum(tmin, 0)) & (tmin <= t[idx])
+
+        idx = np.arange(len(packet))
+        stack = self.Stack(((0, idx[hits((0,), idx)[0]]),))
+        while stack:
+            node, idx = stack.pop()
+            idx = idx[~done[idx]]
+            if len(idx) <= DIVERGED:
+                for k in idx.tolist():
+                    for leaf in self.__leaves(packet.ray(k), node):
+                        yield (*leaf, np.array([k]))
+                continue
+
+            count = counts[node]
+            if count:
+                yield offsets[node], count, idx
+                continue
+            children = (offsets[node], node + 1) if negative[axes[node]] else (node + 1, offsets[node])
+            if cull is not None:
+                children = tuple(c for c in children if not cull(flat, 6 * c))
+                if not children:
+                    continue
+            # the far child goes on the stack first
+            for child, hit in reversed(tuple(zip(children, hits(children, idx)))):
+                if hit.any():
+                    stack.append((child, idx[hit]))
+
+    def trace_packet(self, packet: Packet) -> None:
+        objects = self.objects
+        for offset, count, idx in self.__packet_leaves(packet):
+            for o in objects[offset:offset + count]:
+                packet.intersect(o, idx)
+
+    def occlude_packet(self, packet: Packet) -> None:
+        objects, done = self.objects, packet.done
+        for offset, count, idx in self.__packet_leaves(packet):
+            for o in objects[offset:offset + count]:
+                idx = idx[~done[idx]]
+                if not len(idx):
+                    break
+                done[packet.intersect(o, idx)] = True
+
+    def trace(self, ray: Ray) -> bool:
+        obj = ray.object
+        objects = self.objects
+        for offset, count in self.__leaves(ray):
+            for o in objects[offset:offset + count]:
+                o.intersect(ray)
+        return ray.object is not obj
+
+    def occluder(self, ray: Ray) -> Optional[SceneObject]:
+        objects = self.objects
+        for offset, count in self.__leaves(ray):
+            for o in objects[offset:offset + count]:
+                if o.intersect(ray):
+                    return o
+        return None
+
+    def get_candidates(self, ray: Ray) -> Set[SceneObject]:
+        c = set()
+        for offset, count in self.__leaves(ray):
+            c.update(self.objects[offset:offset + count])
+        return c
@@ -6,6 +6,10 @@ INFINITY = float("inf")
 HORIZON = 1e10
 DELTA_SMALL = .0001
 TWO_PI = 2 * pi
+# reflection rays stop after MAX_DEPTH bounces or once they carry less than
+# CUTOFF of their pixel's colour
+MAX_DEPTH = 5
+CUTOFF = 1 / 255
 
 
 ROOT_DIRECTORY = Path(__file__).parents[3]
@@ -1,15 +1,32 @@
 from .constants import TWO_PI
-from .types import Parameter
+from .types import PARAMETER_REGISTRY, Parameter
 
 from functools import partial
 from math import cos, sin
-from typing import Callable, TypeVar
+from typing import Callable, List, TypeVar, Union
+
+import numpy as np
 
 T = TypeVar("T")
+Frames = Union[int, List[int], np.ndarray]
+
+# array counterparts of the scalar functions used by the builders below
+VECTORIZED = {sin: np.sin, cos: np.cos}
+
+
+def sample(f: Callable[[], Parameter], frames: Frames, *args, **kwargs) -> np.ndarray:
+    if isinstance(f, ParamterizedFunction):
+        return f.sample(frames, *args, **kwargs)
+    p = f(*args, **kwargs)
+    # only evaluated, never animated: keep it out of the registry
+    PARAMETER_REGISTRY.pop(p.key, None)
+    return p.sample(frames)
+
 
 class ParamterizedFunction(Parameter):
-    def __init__(self, f: Callable[[], Parameter]) -> None:
+    def __init__(self, f: Callable[[], Parameter], *terms: Callable[[], Parameter]) -> None:
         self.__function = f
+        self.__terms = terms
 
     def __call__(self, *args, **kwargs):
         return self.__function(*args, **kwargs)
@@ -17,19 +34,40 @@ class ParamterizedFunction(Parameter):
     def __add__(self, f: Callable[[], Parameter]):
         def __composition(*args, **kwargs):
             return self.__function(*args, **kwargs) + f(*args, **kwargs)
-        return ParamterizedFunction(f=__composition)
+        return ParamterizedFunction(__composition, self, f)
+
+    def at(self, frame: int, *args, **kwargs) -> T:
+        return self.sample([frame], *args, **kwargs)[0]
+
+    def sample(self, frames: Frames, *args, **kwargs) -> np.ndarray:
+        if self.__terms:
+            return sum(sample(term, frames, *args, **kwargs) for term in self.__terms)
+        return sample(self.__function, frames, *args, **kwargs)
+
+class Scaled:
+    def __init__(self, r: T, f: Callable[[T], T]) -> None:
+        self.r = r
+        self.f = f
+
+    def __call__(self, t: T) -> T:
+        if isinstance(t, np.ndarray):
+            return self.r * VECTORIZED.get(self.f, self.f)(t)
+        return self.r * self.f(t)
+
+def square(t: T) -> T:
+    return t * t
 
 def parameter(a: T, b: T, steps: int = 1, function = None) -> T:
     return Parameter(a, b, steps=steps, function=function)
 
 def sine(r: T, steps: int = 1) -> Callable[[], Parameter]:
-    return partial(parameter, 0, TWO_PI, steps=steps, function=lambda t: r * sin(t))
+    return partial(parameter, 0, TWO_PI, steps=steps, function=Scaled(r, sin))
 
 def cosine(r: T, steps: int = 1) -> Callable[[], Parameter]:
-    return partial(parameter, 0, TWO_PI, steps=steps, function=lambda t: r * cos(t))
+    return partial(parameter, 0, TWO_PI, steps=steps, function=Scaled(r, cos))
 
 def linear(steps: int = 1) -> Callable[[T, T], Parameter]:
     return partial(parameter, steps=steps)
 
 def quadratic(steps: int = 1) -> Callable[[T, T], Parameter]:
-    return partial(parameter, steps=steps, function=lambda t: t * t)
\ No newline at end of file
+    return partial(parameter, steps=steps, function=square)
\ No newline at end of file
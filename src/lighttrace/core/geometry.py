@@ -12,16 +12,22 @@ class Plane(SceneObject, Parameterized):
         "normal",
     )
     def __init__(self, center: Point, normal: Vector3, surface: AbstractSurface) -> None:
-        self.__center = center
-        self.normal = normal.normalized
+        self.__center = self.bind("center", center)
+        self.update_parameter("normal", self.bind("normal", normal))
         self.surface = surface
 
+    def update_parameter(self, attr: str, value: Vector3):
+        if attr == "normal":
+            value = value.normalized
+        super().update_parameter(attr, value)
+
     def intersect(self, ray: Ray) -> bool:
         cos = ray.direction.dot(self.normal)
         if not cos:
             return False
 
-        t = (self.center - ray.anchor).dot(self.normal) / cos
+        center = self.center if self.motion is None else self.center + self.motion * ray.time
+        t = (center - ray.anchor).dot(self.normal) / cos
 
         if t > ray.t or t < 0:
             return False
@@ -34,13 +40,17 @@ class Plane(SceneObject, Parameterized):
 
     def shade(self, ray: Ray, scene: Scene) -> RGBAPixel:
         p = ray.anchor + (ray.direction * ray.t)
-        v = -1 * ray.direction
-        return self.surface.shade(p, v.normalized, self.normal, scene)
+        v = ray.direction * -1
+        return self.surface.shade(p, v, self.normal, scene, time=ray.time, depth=ray.depth, throughput=ray.throughput, shadows=ray.shadows)
 
     @property
     def center(self) -> Point:
         return self.__center
 
+    @center.setter
+    def center(self, center: Point) -> None:
+        self.__center = center
+
     @property
     def bounds(self) -> Volume:
         bounds = [Bounds(-INFINITY, INFINITY) for _ in range(3)]
@@ -60,19 +70,19 @@ class Sphere(SceneObject, Parameterized):
     )
     def __init__(self, radius: float = 1, center: Point = None, surface: AbstractSurface = None) -> None:
         self.radius = radius
-        self.__center = center
+        self.__center = self.bind("center", center)
         self.surface = surface
 
     def intersect(self, ray: Ray) -> bool:
         r = self.radius
-        center_to_anchor = Vector3(*(self.center - ray.anchor))
+        center = self.center if self.motion is None else self.center + self.motion * ray.time
+        center_to_anchor = center - ray.anchor
         v = center_to_anchor.dot(ray.direction)
-        d = center_to_anchor.size
 
         if (v - r) > ray.t:
             return False
 
-        t = (r * r) + (v * v) - (d * d)
+        t = (r * r) + (v * v) - center_to_anchor.dot(center_to_anchor)
         if t < 0:
             return False
 
@@ -89,18 +99,25 @@ class Sphere(SceneObject, Parameterized):
 
     def shade(self, ray: Ray, scene: Scene) -> RGBAPixel:
         p = ray.anchor + (ray.direction * ray.t)
-        v = ray.direction.normalized * -1
-        n = (p - self.center).normalized
-        return self.surface.shade(p, v, n, scene)
+        v = ray.direction * -1
+        n = (p - self.center_at(ray.time)).normalized
+        return self.surface.shade(p, v, n, scene, time=ray.time, depth=ray.depth, throughput=ray.throughput, shadows=ray.shadows)
 
     @property
     def center(self) -> Point:
         return self.__center
 
+    @center.setter
+    def center(self, center: Point) -> None:
+        self.__center = center
 
-    @property
-    def bounds(self) -> Tuple[Bounds]:
-        c = self.center
+    def center_at(self, time: float) -> Point:
+        if self.motion is None:
+            return self.__center
+        return self.__center + self.motion * time
+
+    def bounds_at(self, time: float) -> Tuple[Bounds]:
+        c = self.center_at(time)
         r = self.radius
         return Volume(
             i=Bounds(min=c.i - r, max=c.i + r),
@@ -108,6 +125,10 @@ class Sphere(SceneObject, Parameterized):
             k=Bounds(min=c.k - r, max=c.k + r),
         )
 
+    @property
+    def bounds(self) -> Tuple[Bounds]:
+        return self.bounds_at(0.0)
+
 
 class Polygon(SceneObject):
     _type = BoundsType.FINITE
@@ -156,7 +177,7 @@ class Polygon(SceneObject):
         if t < 0:
             return False
 
-        r = ray.direction.normalized * t
+        r = ray.direction * t
         vertices = self.vertices
         n = len(vertices)
         x = ray.anchor + r
@@ -176,8 +197,8 @@ class Polygon(SceneObject):
 
     def shade(self, ray: Ray, scene: Scene) -> RGBAPixel:
         p = ray.anchor + ray.direction * ray.t
-        v = ray.direction.normalized * -1
-        return self.surface.shade(p, v, self.normal, scene)
+        v = ray.direction * -1
+        return self.surface.shade(p, v, self.normal, scene, time=ray.time, depth=ray.depth, throughput=ray.throughput, shadows=ray.shadows)
 
     @property
     def center(self) -> Point:
@@ -204,3 +225,49 @@ class Polygon(SceneObject):
             j=Bounds(min_j, max_j),
             k=Bounds(min_k, max_k),
         )
+
+
+class Triangle(Polygon):
+    # Möller–Trumbore against edges worked out once: `edges` packs the first
+    # vertex and the edges from it to the second and third as nine floats
+    def __init__(self, vertices: List[Vector3], surface: AbstractSurface) -> None:
+        super().__init__(vertices, surface)
+        a, b, c = vertices
+        self.edges = (
+            a.i, a.j, a.k,
+            b.i - a.i, b.j - a.j, b.k - a.k,
+            c.i - a.i, c.j - a.j, c.k - a.k,
+        )
+
+    def intersect(self, ray: Ray) -> bool:
+        ax, ay, az, e1x, e1y, e1z, e2x, e2y, e2z = self.edges
+        d = ray.direction
+        dx, dy, dz = d.i, d.j, d.k
+
+        px = dy * e2z - dz * e2y
+        py = dz * e2x - dx * e2z
+        pz = dx * e2y - dy * e2x
+        det = e1x * px + e1y * py + e1z * pz
+        if not det:
+            return False
+        inverse = 1 / det
+
+        o = ray.anchor
+        sx, sy, sz = o.i - ax, o.j - ay, o.k - az
+        u = (sx * px + sy * py + sz * pz) * inverse
+        if u < 0 or u > 1:
+            return False
+
+        qx = sy * e1z - sz * e1y
+        qy = sz * e1x - sx * e1z
+        qz = sx * e1y - sy * e1x
+        v = (dx * qx + dy * qy + dz * qz) * inverse
+        if v < 0 or u + v > 1:
+            return False
+
+        t = (e2x * qx + e2y * qy + e2z * qz) * inverse
+        if t < 0 or t >= ray.t:
+            return False
+        ray.t = t
+        ray.object = self
+        return True
@@ -1,41 +1,373 @@
+from .bvh import BinaryBVH
 from .constants import RESOURCE_DIRECTORY
-from .geometry import Polygon
+from .geometry import Polygon, Triangle
 from .types import AbstractSurface, Vector3
 
-from typing import Generator, List
-from pathlib import Path
+from array import array
+from typing import Dict, Generator, List, Optional, Tuple, Union
 
-import re
+import hashlib
+import json
+import mmap
+import os
+import struct
 
-VERTEX_REGEX = re.compile(r"")
-FACE_REGEX = re.compile(r"")
+import numpy as np
+
+CHUNK_SIZE = 1 << 24
+
+# binary cache written next to the source file: magic, header length, a json
+# header describing every array, then the raw arrays at aligned offsets
+CACHE_SUFFIX = ".cache"
+CACHE_MAGIC = b"LTMESH\x00\x01"
+CACHE_ALIGNMENT = 64
+MESH_ARRAYS = ("vertices", "normals", "texcoords", "indices", "normal_indices", "texcoord_indices")
+BVH_ARRAYS = ("bvh_boxes", "bvh_offsets", "bvh_counts", "bvh_axes", "bvh_faces")
+
+
+def _parse_floats(payload: List[bytes], width: int) -> np.ndarray:
+    values = np.fromstring(b" ".join(payload), dtype=np.float32, sep=" ")
+    if values.size == width * len(payload):
+        return values.reshape(-1, width)
+    # rows with optional extra components (`v x y z w`, `vt u v w`, vertex colours)
+    rows = [np.fromstring(p, dtype=np.float32, sep=" ")[:width] for p in payload]
+    return np.array(rows, dtype=np.float32).reshape(-1, width)
+
+
+def _file_digest(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _align(offset: int) -> int:
+    return -(-offset // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+
+
+def write_cache(path: str, source: os.stat_result, digest: str, arrays: Dict[str, np.ndarray]) -> None:
+    header = {"mtime": source.st_mtime_ns, "size": source.st_size, "sha1": digest, "arrays": {}}
+    offset = 0
+    for name, data in arrays.items():
+        header["arrays"][name] = {"dtype": data.dtype.str, "shape": data.shape, "offset": offset}
+        offset = _align(offset + data.nbytes)
+    encoded = json.dumps(header).encode()
+    start = _align(len(CACHE_MAGIC) + 8 + len(encoded))
+
+    # write to a temporary file and swap it in, so concurrent jobs never see
+    # a partially written cache
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(CACHE_MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+        for name, data in arrays.items():
+            f.seek(start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(data).tobytes())
+    os.replace(tmp, path)
+
+
+def read_cache(path: str) -> Tuple[dict, Dict[str, np.ndarray]]:
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+        raise ValueError(f"{path} is not a mesh cache")
+    length, = struct.unpack_from("<Q", buffer, len(CACHE_MAGIC))
+    header = json.loads(buffer[len(CACHE_MAGIC) + 8:len(CACHE_MAGIC) + 8 + length])
+    start = _align(len(CACHE_MAGIC) + 8 + length)
+
+    # the arrays are read-only views onto the mapping, nothing is copied
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        count = int(np.prod(shape))
+        if not count:
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start + spec["offset"]).reshape(shape)
+    return header, arrays
+
+
+def _resolve(idx: np.ndarray, count: int) -> np.ndarray:
+    # OBJ indices are 1-based, negative ones count back from the latest element
+    return np.where(idx < 0, idx + count, idx - 1).astype(np.int32)
+
+
+def _parse_indices(triangles: List[Union[bytes, Tuple[bytes, bytes, bytes]]], counts: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # `triangles` holds either raw `f` payloads or already split vertex triples
+    nv, nt, nn = counts
+    if isinstance(triangles[0], bytes):
+        sample = triangles[0].split(None, 1)[0]
+        flat = b" ".join(triangles)
+    else:
+        sample = triangles[0][0]
+        flat = b" ".join(b" ".join(row) for row in triangles)
+    # the slash counts catch rows whose format differs from the first one
+    # but happen to have as many indices, like `v/vt` and `v//vn`
+    slashes, doubled = flat.count(b"/"), flat.count(b"//")
+    if b"//" in sample:
+        fields, consistent = 2, doubled == slashes // 2 == 3 * len(triangles)
+        flat = flat.replace(b"//", b" ")
+    else:
+        fields = sample.count(b"/") + 1
+        consistent = not doubled and slashes == 3 * (fields - 1) * len(triangles)
+        flat = flat.replace(b"/", b" ")
+    if not consistent:
+        raise ValueError("faces do not share a single index format")
+
+    idx = np.fromstring(flat, dtype=np.int64, sep=" ")
+    if idx.size != 3 * fields * len(triangles):
+        raise ValueError("faces do not share a single index format")
+    idx = idx.reshape(-1, 3, fields)
+
+    v = _resolve(idx[..., 0], nv)
+    missing = np.full(v.shape, -1, dtype=np.int32)
+    if fields == 3:
+        return v, _resolve(idx[..., 2], nn), _resolve(idx[..., 1], nt)
+    if fields == 2 and b"//" in sample:
+        return v, _resolve(idx[..., 1], nn), missing
+    if fields == 2:
+        return v, missing, _resolve(idx[..., 1], nt)
+    return v, missing, missing
 
 
 class Mesh:
     def __init__(self, surface: AbstractSurface, offset: Vector3 = None) -> None:
-        self.__vertices = []
-        self.__faces = []
+        self.vertices = np.empty((0, 3), dtype=np.float32)
+        self.normals = np.empty((0, 3), dtype=np.float32)
+        self.texcoords = np.empty((0, 2), dtype=np.float32)
+        self.indices = np.empty((0, 3), dtype=np.int32)
+        self.normal_indices = np.empty((0, 3), dtype=np.int32)
+        self.texcoord_indices = np.empty((0, 3), dtype=np.int32)
         self.__offset = Vector3(0, 0, 0)
         self.__locus = Vector3(0, 0, 0)
+        self.__polygons = None
         self.surface = surface
+        self.bvh: Optional[BinaryBVH] = None
 
-    def load(self, filename: str) -> None:
-        with open(f"{RESOURCE_DIRECTORY}/{filename}.obj", "r") as f:
-            for line in f:
-                tokens = line.split(" ")
-                if tokens[0] == 'v':
-                    self.__vertices.append(Vector3(*[float(c) for c in tokens[1:]]))
-                elif tokens[0] == 'f':
-                    self.__faces.append(
-                        [[int(i) if len(i) else 0 for i in c.split('/')] for c in tokens[1:]]
-                    )
+    @property
+    def locus(self) -> Vector3:
+        return self.__locus
 
-    def generate_polygons(self) -> Generator[Polygon, None, None]:
-        verts = self.__vertices
-        for face in self.__faces:
-            yield Polygon(
-                vertices=[verts[idx[0] - 1] - self.__locus for idx in face],
-                surface=self.surface
+    def load(self, filename: str, chunk_size: int = CHUNK_SIZE, cache: bool = True, bvh: bool = False) -> None:
+        self.read(f"{RESOURCE_DIRECTORY}/{filename}.obj", chunk_size=chunk_size, cache=cache, bvh=bvh)
+
+    def read(self, path: str, chunk_size: int = CHUNK_SIZE, cache: bool = True, bvh: bool = False) -> None:
+        if cache and self.__read_cache(path, bvh):
+            return
+
+        source = os.stat(path)
+        digest = self.__parse(path, chunk_size)
+        if bvh:
+            self.build_bvh()
+        if cache:
+            try:
+                write_cache(path + CACHE_SUFFIX, source, digest, self.__cache_arrays())
+            except OSError:
+                # read-only resource directories simply go without a cache
+                pass
+
+    def __parse(self, path: str, chunk_size: int) -> str:
+        vertices, normals, texcoords = [], [], []
+        faces, normal_faces, texcoord_faces = [], [], []
+        counts = [0, 0, 0]
+        digest = hashlib.sha1()
+
+        with open(path, "rb") as f:
+            remainder = b""
+            while True:
+                chunk = f.read(chunk_size)
+                digest.update(chunk)
+                if not chunk:
+                    lines = remainder.split(b"\n")
+                else:
+                    chunk = remainder + chunk
+                    cut = chunk.rfind(b"\n") + 1
+                    lines, remainder = chunk[:cut].split(b"\n"), chunk[cut:]
+
+                parsed = self.__parse_chunk(lines, vertices, normals, texcoords, counts)
+                for buffers, data in zip((faces, normal_faces, texcoord_faces), parsed):
+                    buffers.append(data)
+                if not chunk:
+                    break
+
+        self.vertices = np.concatenate(vertices) if vertices else self.vertices
+        self.normals = np.concatenate(normals) if normals else self.normals
+        self.texcoords = np.concatenate(texcoords) if texcoords else self.texcoords
+        self.indices = np.concatenate(faces) if faces else self.indices
+        self.normal_indices = np.concatenate(normal_faces) if normal_faces else self.normal_indices
+        self.texcoord_indices = np.concatenate(texcoord_faces) if texcoord_faces else self.texcoord_indices
+        self.__polygons = None
+        self.bvh = None
+        return digest.hexdigest()
+
+    def __read_cache(self, path: str, bvh: bool) -> bool:
+        try:
+            header, arrays = read_cache(path + CACHE_SUFFIX)
+            source = os.stat(path)
+        except (OSError, ValueError):
+            return False
+
+        # a touched but otherwise unchanged source still hits the cache, which
+        # is then rewritten with the new mtime so the next load skips the hash
+        if (header["mtime"], header["size"]) != (source.st_mtime_ns, source.st_size):
+            if header["size"] != source.st_size or header["sha1"] != _file_digest(path):
+                return False
+            try:
+                write_cache(path + CACHE_SUFFIX, source, header["sha1"], arrays)
+            except OSError:
+                pass
+        if bvh and "bvh_boxes" not in arrays:
+            return False
+
+        for name in MESH_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.__polygons = None
+        self.bvh = None
+        if bvh:
+            boxes, offsets, counts, axes, order = (arrays[name] for name in BVH_ARRAYS)
+            polygons = self.polygons
+            self.bvh = BinaryBVH.restore(
+                [polygons[face] for face in order.tolist()],
+                array("d", boxes.tobytes()),
+                array("i", offsets.tobytes()),
+                array("i", counts.tobytes()),
+                array("b", axes.tobytes()),
             )
+        return True
+
+    def __cache_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {name: getattr(self, name) for name in MESH_ARRAYS}
+        if self.bvh is not None:
+            arrays.update(
+                bvh_boxes=np.frombuffer(self.bvh.boxes, dtype=np.float64),
+                bvh_offsets=np.frombuffer(self.bvh.offsets, dtype=np.int32),
+                bvh_counts=np.frombuffer(self.bvh.counts, dtype=np.int32),
+                bvh_axes=np.frombuffer(self.bvh.axes, dtype=np.int8),
+                bvh_faces=np.array([o.face for o in self.bvh.objects], dtype=np.int32),
+            )
+        return arrays
+
+    def build_bvh(self) -> BinaryBVH:
+        self.bvh = BinaryBVH(self.polygons)
+        return self.bvh
+
+    def __parse_chunk(self, lines, vertices, normals, texcoords, counts):
+        v, vn, vt, f = [], [], [], []
+        for line in lines:
+            tag, _, payload = line.partition(b" ")
+            if tag == b"v":
+                v.append(payload)
+            elif tag == b"f":
+                f.append(payload)
+            elif tag == b"vn":
+                vn.append(payload)
+            elif tag == b"vt":
+                vt.append(payload)
+
+        if (v or vn or vt) and b"-" in b" ".join(f):
+            # relative indices interleaved with new vertex data in this chunk:
+            # resolve them line by line against the running counts
+            return self.__parse_interleaved(lines, vertices, normals, texcoords, counts)
+
+        for payload, buffers, width, slot in ((v, vertices, 3, 0), (vt, texcoords, 2, 1), (vn, normals, 3, 2)):
+            if payload:
+                data = _parse_floats(payload, width)
+                buffers.append(data)
+                counts[slot] += len(data)
+        return self.__parse_faces(f, counts)
+
+    def __parse_interleaved(self, lines, vertices, normals, texcoords, counts):
+        faces = [[np.empty((0, 3), dtype=np.int32)] for _ in range(3)]
+        for line in lines:
+            tag, _, payload = line.partition(b" ")
+            if tag in (b"v", b"vt", b"vn"):
+                width, buffers, slot = {b"v": (3, vertices, 0), b"vt": (2, texcoords, 1), b"vn": (3, normals, 2)}[tag]
+                buffers.append(_parse_floats([payload], width))
+                counts[slot] += 1
+            elif tag == b"f":
+                for dst, src in zip(faces, self.__parse_faces([payload], counts)):
+                    dst.append(src)
+        return tuple(np.concatenate(fs) for fs in faces)
+
+    @staticmethod
+    def __parse_faces(payload: List[bytes], counts: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if payload:
+            try:
+                # all triangles in one index format: parse the chunk in one go
+                return _parse_indices(payload, counts)
+            except ValueError:
+                pass
+
+        triangles = []
+        for row in (p.split() for p in payload):
+            if len(row) == 3:
+                triangles.append(row)
+            else:
+                # fan-triangulate n-gons into (a, b, c), (a, c, d), ...
+                for idx in range(1, len(row) - 1):
+                    triangles.append((row[0], row[idx], row[idx + 1]))
+
+        if not triangles:
+            empty = np.empty((0, 3), dtype=np.int32)
+            return empty, empty, empty
+        try:
+            return _parse_indices(triangles, counts)
+        except ValueError:
+            # faces mixing `v`, `v/vt`, `v//vn` and `v/vt/vn` within one chunk:
+            # each format is parsed on its own, the faces keep their order
+            groups = {}
+            for face, row in enumerate(triangles):
+                groups.setdefault((row[0].count(b"/"), b"//" in row[0]), []).append(face)
+            buffers = tuple(np.empty((len(triangles), 3), dtype=np.int32) for _ in range(3))
+            for faces in groups.values():
+                for buffer, parsed in zip(buffers, _parse_indices([triangles[f] for f in faces], counts)):
+                    buffer[faces] = parsed
+            return buffers
+
+    @property
+    def polygons(self) -> List[Polygon]:
+        if self.__polygons is None:
+            self.__polygons = [MeshTriangle(self, face, edges) for face, edges in enumerate(self.edges.tolist())]
+        return self.__polygons
+
+    @property
+    def edges(self) -> np.ndarray:
+        # every face's Triangle.edges, one row each, computed in one go
+        corners = self.vertices[self.indices].astype(np.float64)
+        a = corners[:, 0] - tuple(self.locus)
+        return np.hstack((a, corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]))
+
+    def generate_polygons(self) -> Generator[Polygon, None, None]:
+        yield from self.polygons
+
+
+class MeshTriangle(Triangle):
+    # a view onto one face of a Mesh; vertices are only pulled out of the
+    # mesh buffers the first time the triangle is actually needed
+    def __init__(self, mesh: Mesh, face: int, edges: Tuple[float, ...]) -> None:
+        self.mesh = mesh
+        self.face = face
+        self.surface = mesh.surface
+        self.edges = tuple(edges)
+        self.__vertices = None
+        self.__normal = None
+
+    @property
+    def vertices(self) -> List[Vector3]:
+        if self.__vertices is None:
+            locus = self.mesh.locus
+            self.__vertices = [
+                Vector3(*v) - locus
+                for v in self.mesh.vertices[self.mesh.indices[self.face]].tolist()
+            ]
+        return self.__vertices
 
+    @property
+    def normal(self) -> Vector3:
+        if self.__normal is None:
+            a, b, c = self.vertices
+            self.__normal = (b - a).cross(c - a).normalized
+        return self.__normal
 
+    def __iter__(self):
+        return iter(self.vertices)
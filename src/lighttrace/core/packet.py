@@ -0,0 +1,180 @@
+from .constants import DELTA_SMALL, INFINITY
+from .geometry import Plane, Polygon, Sphere, Triangle
+from .ray import Ray
+from .types import LightType, Point, Scene, SceneObject, Vector3
+from .vectorized import intersect_planes, intersect_polygons, intersect_spheres, normalize
+
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# primary rays are traced in SIZE x SIZE pixel packets
+SIZE = 16
+# packets down to this many rays are traced one ray at a time instead
+DIVERGED = 2
+
+# (object, anchors, directions, tmax, time) -> distance to every hit, INFINITY on a miss
+Kernel = Callable[[SceneObject, np.ndarray, np.ndarray, np.ndarray, float], np.ndarray]
+
+
+def _sphere(sphere: Sphere, o: np.ndarray, d: np.ndarray, tmax: np.ndarray, time: float) -> np.ndarray:
+    center = np.array([tuple(sphere.center_at(time))], dtype=np.float64)
+    t, _ = intersect_spheres(o, d, center, np.array([sphere.radius], dtype=np.float64), tmax)
+    return t
+
+
+def _plane(plane: Plane, o: np.ndarray, d: np.ndarray, tmax: np.ndarray, time: float) -> np.ndarray:
+    center = plane.center if plane.motion is None else plane.center + plane.motion * time
+    t, _ = intersect_planes(o, d, np.array([tuple(center)]), np.array([tuple(plane.normal)]), tmax)
+    return t
+
+
+def _polygon(polygon: Polygon, o: np.ndarray, d: np.ndarray, tmax: np.ndarray, time: float) -> np.ndarray:
+    vertices = np.array([[tuple(v) for v in polygon.vertices]], dtype=np.float64)
+    t, _ = intersect_polygons(o, d, vertices, np.array([tuple(polygon.normal)]), tmax)
+    return t
+
+
+def _triangle(triangle: Triangle, o: np.ndarray, d: np.ndarray, tmax: np.ndarray, time: float) -> np.ndarray:
+    # Triangle.intersect, a ray per row
+    ax, ay, az, e1x, e1y, e1z, e2x, e2y, e2z = triangle.edges
+    dx, dy, dz = d.T
+    sx, sy, sz = o[:, 0] - ax, o[:, 1] - ay, o[:, 2] - az
+    px = dy * e2z - dz * e2y
+    py = dz * e2x - dx * e2z
+    pz = dx * e2y - dy * e2x
+    qx = sy * e1z - sz * e1y
+    qy = sz * e1x - sx * e1z
+    qz = sx * e1y - sy * e1x
+    det = e1x * px + e1y * py + e1z * pz
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse = 1 / det
+        u = (sx * px + sy * py + sz * pz) * inverse
+        v = (dx * qx + dy * qy + dz * qz) * inverse
+        t = (e2x * qx + e2y * qy + e2z * qz) * inverse
+        hit = (det != 0) & (u >= 0) & (u <= 1) & (v >= 0) & (u + v <= 1) & (t >= 0) & (t < tmax)
+    return np.where(hit, t, INFINITY)
+
+
+# looked up along the object's class hierarchy; objects of any other class
+# are tested one ray at a time
+KERNELS: Dict[type, Kernel] = {
+    Sphere: _sphere,
+    Plane: _plane,
+    Polygon: _polygon,
+    Triangle: _triangle,
+}
+_kernels: Dict[type, Optional[Kernel]] = {}
+
+
+def kernel(cls: type) -> Optional[Kernel]:
+    if cls not in _kernels:
+        _kernels[cls] = next((KERNELS[c] for c in cls.__mro__ if c in KERNELS), None)
+    return _kernels[cls]
+
+
+class Packet:
+    # rays traced together, one per row. every ray keeps the distance to its
+    # nearest hit so far in `t`; `done` marks rays no longer traced, such as
+    # shadow rays already known to be blocked. `rays` are only built for rays
+    # that have to be tested on their own.
+    def __init__(self, anchors: np.ndarray, directions: np.ndarray, t: np.ndarray, time: float = 0.0, rays: List[Ray] = None) -> None:
+        self.anchors = anchors
+        self.directions = directions
+        self.t = t
+        self.time = time
+        self.done = np.zeros(len(t), dtype=bool)
+        with np.errstate(divide="ignore"):
+            self.inverse = np.where(directions != 0, 1 / directions, INFINITY)
+        self.__rays = rays if rays is not None else [None] * len(t)
+
+    @classmethod
+    def of(cls, rays: List[Ray]) -> "Packet":
+        # the rays must share their time
+        anchors = np.array([tuple(r.anchor) for r in rays], dtype=np.float64)
+        directions = np.array([tuple(r.direction) for r in rays], dtype=np.float64)
+        t = np.array([r.t for r in rays], dtype=np.float64)
+        return cls(anchors, directions, t, rays[0].time, rays)
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def ray(self, k: int) -> Ray:
+        ray = self.__rays[k]
+        if ray is None:
+            ray = self.__rays[k] = Ray(Point(*self.anchors[k].tolist()), Vector3(*self.directions[k].tolist()), self.time)
+        ray.t = float(self.t[k])
+        return ray
+
+    def intersect(self, obj: SceneObject, idx: np.ndarray) -> np.ndarray:
+        # obj.intersect on each of the rays at `idx`, returns the ones it hit
+        test = kernel(type(obj))
+        if test is None or len(idx) <= DIVERGED:
+            hits = [k for k in idx.tolist() if obj.intersect(self.ray(k))]
+            for k in hits:
+                self.t[k] = self.__rays[k].t
+            return np.array(hits, dtype=np.int64)
+
+        t = test(obj, self.anchors[idx], self.directions[idx], self.t[idx], self.time)
+        hit = t < INFINITY
+        idx, t = idx[hit], t[hit]
+        self.t[idx] = t
+        rays = self.__rays
+        for k, tk in zip(idx.tolist(), t.tolist()):
+            if rays[k] is not None:
+                rays[k].t = tk
+                rays[k].object = obj
+        return idx
+
+
+def trace(scene: Scene, rays: List[Ray]) -> None:
+    # Ray.trace for every ray, through the hierarchy as one packet
+    packet = Packet.of(rays)
+    if scene.bvh is None:
+        candidates = scene.objects
+    else:
+        scene.bvh.trace_packet(packet)
+        candidates = scene.unbounded_objects
+    everything = np.arange(len(packet))
+    for obj in candidates:
+        packet.intersect(obj, everything)
+
+
+def shadow(scene: Scene, rays: List[Ray]) -> None:
+    # the shadow rays Surface.shade casts from where `rays` hit, traced as a
+    # packet per light; every ray gets `shadows`, which lights are blocked
+    n = len(rays)
+    time = rays[0].time
+    anchors = np.array([tuple(r.anchor) for r in rays], dtype=np.float64)
+    directions = np.array([tuple(r.direction) for r in rays], dtype=np.float64)
+    p = anchors + directions * np.array([r.t for r in rays])[:, None]
+
+    for ray in rays:
+        ray.shadows = {}
+    for light, kind, _, l, _, motion in scene.lighting.lights:
+        if kind == LightType.POINT:
+            position = l if motion is None else l + motion * time
+            l = np.array(tuple(position)) - p
+            t = np.sqrt(np.einsum("ij,ij->i", l, l))
+            l = normalize(l)
+        else:
+            l = np.broadcast_to(np.array(tuple(l), dtype=np.float64), p.shape)
+            t = np.full(n, INFINITY)
+        packet = Packet(p + l * DELTA_SMALL, np.ascontiguousarray(l), t, time)
+        occlude(scene, packet)
+        for ray, blocked in zip(rays, packet.done.tolist()):
+            ray.shadows[light] = blocked
+
+
+def occlude(scene: Scene, packet: Packet) -> None:
+    # Scene.occluded for every ray: marks the blocked ones `done`
+    if scene.bvh is None:
+        candidates = scene.objects
+    else:
+        scene.bvh.occlude_packet(packet)
+        candidates = scene.unbounded_objects
+    for obj in candidates:
+        live = np.flatnonzero(~packet.done)
+        if not len(live):
+            return
+        packet.done[packet.intersect(obj, live)] = True
@@ -0,0 +1,140 @@
+from .types import Color, Scene, Vector3, Viewport
+
+from multiprocessing import Pool, shared_memory
+from os import cpu_count
+from time import perf_counter
+from typing import Callable, Generator, List, Optional, Tuple
+
+import numpy as np
+
+Tile = Tuple[int, int, int, int]
+PixelTracer = Callable[[Scene, Vector3, int, int, Vector3, Vector3, Vector3], Color]
+
+CHANNELS = 3
+# no tile may cost more than 1 / GRAIN of a worker's fair share of the frame
+GRAIN = 4
+# tiles are not split below MIN_TILE pixels a side
+MIN_TILE = 4
+# the pre-pass times PROBES x PROBES pixels of every tile
+PROBES = 2
+
+# per-process state, populated once by `_init_worker`
+_worker = {}
+
+
+def iter_tiles(width: int, height: int, tile_size: int) -> Generator[Tile, None, None]:
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            yield x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)
+
+
+def quarter(tile: Tile) -> List[Tile]:
+    x0, y0, x1, y1 = tile
+    xm, ym = (x0 + x1) // 2, (y0 + y1) // 2
+    quarters = [(x0, y0, xm, ym), (xm, y0, x1, ym), (x0, ym, xm, y1), (xm, ym, x1, y1)]
+    return [q for q in quarters if q[0] < q[2] and q[1] < q[3]]
+
+
+def plan(tiles: List[Tile], costs: np.ndarray, workers: int) -> List[Tile]:
+    # `costs` holds the estimated seconds of every pixel. tiles dearer than
+    # the grain are quartered until none can hold up the end of the frame on
+    # its own, then handed out dearest first so the cheap ones fill the gaps.
+    limit = costs.sum() / (workers * GRAIN)
+    pending, planned = list(tiles), []
+    while pending:
+        tile = pending.pop()
+        x0, y0, x1, y1 = tile
+        cost = costs[y0:y1, x0:x1].sum()
+        if cost > limit and max(x1 - x0, y1 - y0) > MIN_TILE:
+            pending.extend(quarter(tile))
+        else:
+            planned.append((cost, tile))
+    planned.sort(key=lambda c: c[0], reverse=True)
+    return [tile for _, tile in planned]
+
+
+def _init_worker(scene: Scene, viewport: Viewport, trace_pixel: PixelTracer, buffer_name: str) -> None:
+    shm = shared_memory.SharedMemory(name=buffer_name)
+    width, height, du, dv, vp = viewport
+    _worker.update(
+        scene=scene,
+        origin=viewport.origin,
+        basis=(du, dv, vp),
+        trace_pixel=trace_pixel,
+        shm=shm,
+        framebuffer=np.ndarray((height, width, CHANNELS), dtype=np.float32, buffer=shm.buf),
+    )
+
+
+def _probe_tile(tile: Tile) -> Tuple[Tile, float]:
+    # the mean seconds per pixel over a sparse grid of the tile's pixels
+    scene = _worker["scene"]
+    origin = _worker["origin"]
+    du, dv, vp = _worker["basis"]
+    trace_pixel = _worker["trace_pixel"]
+
+    x0, y0, x1, y1 = tile
+    xs = sorted({x0 + (x1 - x0) * (2 * n + 1) // (2 * PROBES) for n in range(PROBES)})
+    ys = sorted({y0 + (y1 - y0) * (2 * n + 1) // (2 * PROBES) for n in range(PROBES)})
+    start = perf_counter()
+    for j in ys:
+        for i in xs:
+            trace_pixel(scene, origin, i, j, du, dv, vp)
+    return tile, (perf_counter() - start) / (len(xs) * len(ys))
+
+
+def _render_tile(tile: Tile) -> Tuple[Tile, float]:
+    scene = _worker["scene"]
+    origin = _worker["origin"]
+    du, dv, vp = _worker["basis"]
+    trace_pixel = _worker["trace_pixel"]
+    framebuffer = _worker["framebuffer"]
+
+    x0, y0, x1, y1 = tile
+    began = perf_counter()
+    for j in range(y0, y1):
+        framebuffer[j, x0:x1] = [tuple(trace_pixel(scene, origin, i, j, du, dv, vp)) for i in range(x0, x1)]
+    return tile, perf_counter() - began
+
+
+def render(
+    viewport: Viewport,
+    scene: Scene,
+    trace_pixel: PixelTracer,
+    framebuffer: np.ndarray,
+    workers: int = None,
+    tile_size: int = 32,
+    progress: Callable[[float], None] = None,
+    costs: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    # the pixels are traced into `framebuffer`, a float32 height x width x
+    # CHANNELS array. `costs` are the seconds every pixel took in a previous
+    # render, e.g. the last animation frame; without them a quick pre-pass
+    # estimates them. returns the seconds every pixel took this time.
+    workers = workers or cpu_count()
+    width, height = viewport.width, viewport.height
+    size = framebuffer.nbytes
+    tiles = list(iter_tiles(width, height, tile_size))
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        # the scene travels once per worker through the initializer, never per tile
+        with Pool(workers, initializer=_init_worker, initargs=(scene, viewport, trace_pixel, shm.name)) as pool:
+            if costs is None or costs.shape != (height, width):
+                costs = np.empty((height, width))
+                for (x0, y0, x1, y1), seconds in pool.imap_unordered(_probe_tile, tiles):
+                    costs[y0:y1, x0:x1] = seconds
+            tiles = plan(tiles, costs, workers)
+
+            # every worker takes the next tile off the shared queue as soon as
+            # it is done with its last one
+            timings = np.empty((height, width))
+            for done, ((x0, y0, x1, y1), seconds) in enumerate(pool.imap_unordered(_render_tile, tiles), 1):
+                timings[y0:y1, x0:x1] = seconds / ((x1 - x0) * (y1 - y0))
+                if progress is not None:
+                    progress(done * 100 / len(tiles))
+        framebuffer[:] = np.ndarray(framebuffer.shape, dtype=np.float32, buffer=shm.buf)
+        return timings
+    finally:
+        shm.close()
+        shm.unlink()
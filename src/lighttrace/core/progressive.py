@@ -0,0 +1,71 @@
+from .parallel import PixelTracer
+from .types import Scene, Viewport
+
+from time import perf_counter
+from typing import Generator, List, Tuple
+
+import numpy as np
+
+Block = Tuple[int, int, int]
+
+STRIDE = 8
+
+
+def iter_steps(stride: int) -> Generator[int, None, None]:
+    # `stride` down to 1, each step dividing the one before, e.g. 8, 4, 2, 1
+    # or 6, 3, 1: a pixel on a step's grid is then on every finer one
+    if stride < 1:
+        raise ValueError("the stride must be at least 1")
+    step = stride
+    while step > 1:
+        yield step
+        step //= next(p for p in range(2, step + 1) if not step % p)
+    yield 1
+
+
+def iter_passes(width: int, height: int, stride: int = STRIDE) -> Generator[List[Block], None, None]:
+    # the first pass traces every `stride`-th pixel of every `stride`-th row,
+    # each later pass traces the pixels of a finer grid that the coarser
+    # passes have not, so every pixel is traced exactly once. every pixel
+    # `(i, j, size)` stands in for the size x size block below and to the
+    # right of it until it is refined; no traced pixel lies in that block.
+    coarser = None
+    for step in iter_steps(stride):
+        yield [
+            (i, j, step)
+            for j in range(0, height, step)
+            for i in range(0, width, step)
+            if coarser is None or i % coarser or j % coarser
+        ]
+        coarser = step
+
+
+def render(
+    viewport: Viewport,
+    scene: Scene,
+    trace_pixel: PixelTracer,
+    framebuffer: np.ndarray,
+    budget: float = None,
+    samples: int = None,
+    stride: int = STRIDE,
+) -> Generator[np.ndarray, None, None]:
+    # yields `framebuffer` after every pass, and once more for a pass the
+    # budget cuts short; the blocks not reached yet are left black
+    width, height, du, dv, vp = viewport
+    origin = viewport.origin
+    deadline = None if budget is None else perf_counter() + budget
+    traced = 0
+
+    def spent() -> bool:
+        return (samples is not None and traced >= samples) or (deadline is not None and perf_counter() >= deadline)
+
+    framebuffer[:] = 0
+    for blocks in iter_passes(width, height, stride):
+        if spent():
+            return
+        for i, j, size in blocks:
+            if spent():
+                break
+            framebuffer[j:j + size, i:i + size] = tuple(trace_pixel(scene, origin, i, j, du, dv, vp))
+            traced += 1
+        yield framebuffer
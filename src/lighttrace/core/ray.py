@@ -2,15 +2,28 @@ from .constants import HORIZON
 from .types import Point, RGBAPixel, Scene, SceneObject, Vector3
 
 class Ray:
-    def __init__(self, p: Point, v: Vector3) -> None:
-        self.anchor = Vector3(*p)
+    # whether each light is blocked from the hit point, when a packet of
+    # shadow rays already found out
+    shadows = None
+
+    def __init__(self, p: Point, v: Vector3, time: float = 0.0, depth: int = 0, throughput: float = 1.0) -> None:
+        self.anchor = p
         self.direction = v.normalized
         self.t = HORIZON
         self.object = None
+        # moment within the shutter interval, from 0 (open) to 1 (closed)
+        self.time = time
+        # bounces since the primary ray, and the share of the pixel's colour
+        # this ray's colour ends up contributing
+        self.depth = depth
+        self.throughput = throughput
 
     def trace(self, scene: Scene) -> RGBAPixel:
-        # candidates = scene.bvh.get_candidates(self) | scene.unbounded_objects
-        candidates = scene.objects
+        if scene.bvh is None:
+            candidates = scene.objects
+        else:
+            scene.bvh.trace(self)
+            candidates = scene.unbounded_objects
         for obj in candidates:
             if obj.intersect(self):
                 continue
@@ -0,0 +1,134 @@
+from PIL import Image
+
+from .constants import OUTPUT_DIRECTORY
+from .parallel import CHANNELS, PixelTracer
+from .sinks import PNGSink, Sink, ThreadedSink, literal
+from .tracer import Tracer
+from .types import Scene, Viewport
+
+from functools import partial
+from multiprocessing import Pool
+from os import cpu_count
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+Snapshot = Dict[int, Any]
+
+# per-process state, populated once by `_init_worker`
+_worker = {}
+
+
+def frame_pattern(directory: str, name: str, viewport: Viewport) -> str:
+    return literal(f"{OUTPUT_DIRECTORY}/{directory}/{name}__{viewport.width}x{viewport.height}__") + "{frame}.png"
+
+
+def frame_path(directory: str, name: str, viewport: Viewport, frame: int) -> Path:
+    return PNGSink(frame_pattern(directory, name, viewport)).path(frame)
+
+
+def _init_worker(scene: Scene, viewport: Viewport, trace_pixel: PixelTracer) -> None:
+    # scene and viewport arrive in one pickle, so the animated values they
+    # share are still shared here and re-registered under their original keys.
+    # every frame the worker renders reuses the same buffers.
+    shape = (viewport.height, viewport.width, CHANNELS)
+    _worker.update(
+        scene=scene,
+        viewport=viewport,
+        trace_pixel=trace_pixel,
+        framebuffer=np.zeros(shape, dtype=np.float32),
+        pixels=np.zeros(shape, dtype=np.uint8),
+    )
+
+
+def render_frame(
+    scene: Scene,
+    viewport: Viewport,
+    trace_pixel: PixelTracer,
+    snapshot: Snapshot,
+    end: Snapshot = None,
+    framebuffer: np.ndarray = None,
+    pixels: np.ndarray = None,
+) -> bytes:
+    # pixels accumulate unclamped in `framebuffer` and are clamped into
+    # `pixels` like Tracer.present does; both are allocated if not given
+    if end is None:
+        scene.restore(snapshot)
+        scene.construct()
+    else:
+        scene.blur(snapshot, end)
+    viewport = viewport.current()
+    width, height, du, dv, vp = viewport
+    origin = viewport.origin
+
+    shape = (height, width, CHANNELS)
+    if framebuffer is None:
+        framebuffer = np.zeros(shape, dtype=np.float32)
+    if pixels is None:
+        pixels = np.zeros(shape, dtype=np.uint8)
+    for j in range(height):
+        framebuffer[j] = [tuple(trace_pixel(scene, origin, i, j, du, dv, vp)) for i in range(width)]
+    return Tracer.clamp(framebuffer, pixels).tobytes()
+
+
+def _render_frame(job: Tuple[int, Snapshot, Snapshot]) -> Tuple[int, bytes]:
+    frame, snapshot, end = job
+    pixels = render_frame(
+        _worker["scene"],
+        _worker["viewport"],
+        _worker["trace_pixel"],
+        snapshot,
+        end,
+        framebuffer=_worker["framebuffer"],
+        pixels=_worker["pixels"],
+    )
+    return frame, pixels
+
+
+def render(
+    scene: Scene,
+    viewport: Viewport,
+    trace_pixel: PixelTracer,
+    frames: int,
+    directory: str,
+    name: str,
+    workers: int = None,
+    resume: bool = True,
+    progress: Callable[[int], None] = None,
+    motion_samples: int = 1,
+    shutter: float = 1.0,
+    sink: Sink = None,
+) -> List[Path]:
+    # frames go to `sink` in order, by default as PNGs written on a thread
+    # while the next frames render; only those PNGs can be resumed from
+    Path(f"{OUTPUT_DIRECTORY}/{directory}").mkdir(parents=True, exist_ok=True)
+    paths = [frame_path(directory, name, viewport, frame) for frame in range(frames)]
+    if sink is None:
+        sink = ThreadedSink(PNGSink(frame_pattern(directory, name, viewport)))
+    else:
+        resume = False
+
+    # each frame's parameter values are worked out up front, so any worker can
+    # jump straight to any frame; frames already on disk are skipped. with
+    # motion blur the shutter stays open for `shutter` frames.
+    blur = motion_samples > 1
+    jobs = [
+        (frame, scene.snapshot(frame), scene.snapshot(frame + shutter) if blur else None)
+        for frame in range(frames)
+        if not (resume and paths[frame].exists())
+    ]
+    if not jobs:
+        sink.close()
+        return paths
+    if blur:
+        trace_pixel = partial(trace_pixel, times=Tracer.shutter_times(motion_samples))
+
+    workers = min(workers or cpu_count(), len(jobs))
+    with sink, Pool(workers, initializer=_init_worker, initargs=(scene, viewport, trace_pixel)) as pool:
+        # imap hands results back in frame order while the workers run ahead
+        for frame, pixels in pool.imap(_render_frame, jobs):
+            sink.write(Image.frombytes("RGB", (viewport.width, viewport.height), pixels), frame)
+            if progress is not None:
+                progress(frame)
+    return paths
@@ -0,0 +1,156 @@
+from PIL import Image
+
+from .parallel import CHANNELS
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from queue import Queue
+from subprocess import PIPE, Popen
+from threading import Thread
+from typing import BinaryIO, List, Optional, Tuple
+
+import atexit
+import sys
+
+import numpy as np
+
+FPS = 30
+# frames a ThreadedSink holds before `write` blocks
+BACKLOG = 8
+
+
+def literal(path: str) -> str:
+    # `path` as a PNGSink pattern that formats back to itself
+    return path.replace("{", "{{").replace("}", "}}")
+
+
+class Sink(ABC):
+    # frames are numbered from 0; sinks writing one file per frame name them
+    # from 1, like the animation renderer always has
+    @abstractmethod
+    def write(self, image: Image.Image, frame: int = 0) -> None:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class PNGSink(Sink):
+    def __init__(self, pattern: str) -> None:
+        # `pattern` may hold a `{frame}` field; without one every frame
+        # overwrites the same file
+        self.pattern = pattern
+
+    def path(self, frame: int) -> Path:
+        return Path(self.pattern.format(frame=frame + 1))
+
+    def write(self, image: Image.Image, frame: int = 0) -> None:
+        image.save(self.path(frame), "PNG")
+
+
+class PPMSink(PNGSink):
+    # uncompressed binary PPM, so writing a frame costs no encoding at all
+    def write(self, image: Image.Image, frame: int = 0) -> None:
+        with open(self.path(frame), "wb") as f:
+            f.write(b"P6 %d %d 255\n" % image.size)
+            f.write(image.tobytes())
+
+
+class MappedSink(Sink):
+    # every frame in one raw, memory-mapped file of `frames` x height x width
+    # RGB bytes; the pages are flushed to disk by the OS as they fill
+    def __init__(self, path: str, width: int, height: int, frames: int) -> None:
+        self.frames = np.memmap(path, dtype=np.uint8, mode="w+", shape=(frames, height, width, CHANNELS))
+
+    def write(self, image: Image.Image, frame: int = 0) -> None:
+        self.frames[frame] = np.asarray(image)
+
+    def close(self) -> None:
+        self.frames.flush()
+
+    @staticmethod
+    def load(path: str, width: int, height: int) -> np.ndarray:
+        return np.memmap(path, dtype=np.uint8, mode="r").reshape(-1, height, width, CHANNELS)
+
+
+class StreamSink(Sink):
+    # raw rgb24 frames back to back, e.g. for
+    #   ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH -r 30 -i - out.mp4
+    # the tracer's diagnostics and progress go to stderr, clear of the stream
+    def __init__(self, stream: BinaryIO = None) -> None:
+        self.stream = stream if stream is not None else sys.stdout.buffer
+
+    def write(self, image: Image.Image, frame: int = 0) -> None:
+        self.stream.write(image.tobytes())
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+class PipeSink(StreamSink):
+    # streams the frames into the stdin of an encoder started with `command`
+    def __init__(self, command: List[str]) -> None:
+        self.process = Popen(command, stdin=PIPE)
+        super().__init__(self.process.stdin)
+
+    def close(self) -> None:
+        if not self.stream.closed:
+            self.stream.close()
+        self.process.wait()
+
+
+def encoder(path: str, width: int, height: int, fps: int = FPS) -> List[str]:
+    # an ffmpeg command line for PipeSink that encodes the frames to `path`
+    return [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        "-pix_fmt", "yuv420p", path,
+    ]
+
+
+class ThreadedSink(Sink):
+    # hands the frames to `sink` on a background thread, so encoding and disk
+    # I/O overlap with rendering the next frame. `write` only blocks once
+    # `backlog` frames are waiting; `close` waits for all of them.
+    def __init__(self, sink: Sink, backlog: int = BACKLOG) -> None:
+        self.sink = sink
+        self.__queue: "Queue[Optional[Tuple[Image.Image, int]]]" = Queue(backlog)
+        self.__error: Optional[BaseException] = None
+        self.__thread = Thread(target=self.__drain, daemon=True)
+        self.__thread.start()
+        # the daemon thread would otherwise be killed with frames still queued
+        atexit.register(self.close)
+
+    def __drain(self) -> None:
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            if self.__error is None:
+                try:
+                    self.sink.write(*item)
+                except BaseException as e:
+                    self.__error = e
+
+    def __raise(self) -> None:
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise error
+
+    def write(self, image: Image.Image, frame: int = 0) -> None:
+        self.__raise()
+        self.__queue.put((image, frame))
+
+    def close(self) -> None:
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+            atexit.unregister(self.close)
+            self.sink.close()
+        self.__raise()
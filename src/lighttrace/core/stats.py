@@ -0,0 +1,315 @@
+from PIL import Image
+
+from . import packet
+from .bvh import BinaryBVH
+from .parallel import PixelTracer
+from .ray import Ray
+from .types import BoundingVolumeHierarchy, Scene, SceneObject
+from .volume import Octree
+
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, Generator, List, Optional, Set, Tuple
+
+import numpy as np
+
+TRAVERSAL = "traversal"
+SHADING = "shading"
+# the per-pixel counters recorded by `costed`, in channel order
+COSTS = ("intersection_tests", "nodes_visited", "secondary_rays")
+
+
+@dataclass
+class RenderStats:
+    primary_rays: int = 0
+    shadow_rays: int = 0
+    reflection_rays: int = 0
+    # reflection rays not traced for being too deep or contributing too little
+    depth_cutoffs: int = 0
+    importance_cutoffs: int = 0
+    # keyed by the class name of the object tested
+    intersection_tests: Dict[str, int] = field(default_factory=dict)
+    nodes_visited: int = 0
+    # intersection tests against the objects in the hierarchy's leaves
+    leaf_tests: int = 0
+    seconds: float = 0.0
+    # exclusive times: a shadow ray cast while shading counts as traversal
+    traversal_seconds: float = 0.0
+    shading_seconds: float = 0.0
+
+    @property
+    def rays(self) -> int:
+        return self.primary_rays + self.shadow_rays + self.reflection_rays
+
+    @property
+    def secondary_rays(self) -> int:
+        return self.shadow_rays + self.reflection_rays
+
+    @property
+    def rays_per_second(self) -> float:
+        return self.rays / self.seconds if self.seconds else 0.0
+
+    def cost(self) -> Tuple[int, int, int]:
+        # the running totals of `COSTS`
+        return sum(self.intersection_tests.values()), self.nodes_visited, self.secondary_rays
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class _Collector:
+    def __init__(self) -> None:
+        self.stats = RenderStats()
+        self.start = self.mark = perf_counter()
+        # categories being timed, innermost last; time is always charged to
+        # the innermost one only
+        self.clock: List[str] = []
+        self.shading = 0
+        self.hierarchy = 0
+
+    def enter(self, category: str) -> None:
+        self.__charge()
+        self.clock.append(category)
+        if category is SHADING:
+            self.shading += 1
+
+    def exit(self) -> None:
+        self.__charge()
+        if self.clock.pop() is SHADING:
+            self.shading -= 1
+
+    def __charge(self) -> None:
+        now = perf_counter()
+        if self.clock:
+            if self.clock[-1] is TRAVERSAL:
+                self.stats.traversal_seconds += now - self.mark
+            else:
+                self.stats.shading_seconds += now - self.mark
+        self.mark = now
+
+    def finish(self) -> RenderStats:
+        self.stats.seconds = perf_counter() - self.start
+        return self.stats
+
+
+_collector: Optional[_Collector] = None
+# (owner, attribute, original value) of everything patched by `start`
+_originals: List[Tuple[type, str, object]] = []
+
+
+class _CountingStack(list):
+    # stands in for the traversal stack of BinaryBVH: every node popped is visited
+    def pop(self, *args):
+        _collector.stats.nodes_visited += 1
+        return super().pop(*args)
+
+
+def _trace(trace: Callable) -> Callable:
+    @wraps(trace)
+    def wrapper(ray: Ray, scene: Scene) -> bool:
+        c = _collector
+        if c.shading:
+            c.stats.reflection_rays += 1
+        else:
+            c.stats.primary_rays += 1
+        c.enter(TRAVERSAL)
+        hit = trace(ray, scene)
+        c.exit()
+        return hit
+    return wrapper
+
+
+def _occluded(occluded: Callable) -> Callable:
+    @wraps(occluded)
+    def wrapper(scene: Scene, ray: Ray, light=None) -> bool:
+        c = _collector
+        c.stats.shadow_rays += 1
+        c.enter(TRAVERSAL)
+        blocked = occluded(scene, ray, light)
+        c.exit()
+        return blocked
+    return wrapper
+
+
+def _packet_trace(trace: Callable) -> Callable:
+    @wraps(trace)
+    def wrapper(scene: Scene, rays: List[Ray]) -> None:
+        c = _collector
+        c.stats.primary_rays += len(rays)
+        c.enter(TRAVERSAL)
+        trace(scene, rays)
+        c.exit()
+    return wrapper
+
+
+def _packet_shadow(shadow: Callable) -> Callable:
+    @wraps(shadow)
+    def wrapper(scene: Scene, rays: List[Ray]) -> None:
+        c = _collector
+        c.stats.shadow_rays += len(rays) * len(scene.lighting.lights)
+        c.enter(TRAVERSAL)
+        shadow(scene, rays)
+        c.exit()
+    return wrapper
+
+
+def _packet_intersect(intersect: Callable) -> Callable:
+    # counts the rays a kernel tests; those tested one at a time are
+    # already counted by `_intersect`
+    @wraps(intersect)
+    def wrapper(p: packet.Packet, obj: SceneObject, idx: np.ndarray) -> np.ndarray:
+        if packet.kernel(type(obj)) is not None and len(idx) > packet.DIVERGED:
+            stats = _collector.stats
+            name = type(obj).__name__
+            stats.intersection_tests[name] = stats.intersection_tests.get(name, 0) + len(idx)
+            if _collector.hierarchy:
+                stats.leaf_tests += len(idx)
+        return intersect(p, obj, idx)
+    return wrapper
+
+
+def _reflects(reflects: Callable) -> Callable:
+    @wraps(reflects)
+    def wrapper(scene: Scene, depth: int, throughput: float) -> bool:
+        traced = reflects(scene, depth, throughput)
+        if not traced:
+            if depth > scene.max_depth:
+                _collector.stats.depth_cutoffs += 1
+            else:
+                _collector.stats.importance_cutoffs += 1
+        return traced
+    return wrapper
+
+
+def _intersect(intersect: Callable) -> Callable:
+    @wraps(intersect)
+    def wrapper(obj: SceneObject, ray: Ray) -> bool:
+        stats = _collector.stats
+        name = type(obj).__name__
+        stats.intersection_tests[name] = stats.intersection_tests.get(name, 0) + 1
+        if _collector.hierarchy:
+            stats.leaf_tests += 1
+        return intersect(obj, ray)
+    return wrapper
+
+
+def _shade(shade: Callable) -> Callable:
+    @wraps(shade)
+    def wrapper(obj: SceneObject, ray: Ray, scene: Scene):
+        c = _collector
+        c.enter(SHADING)
+        color = shade(obj, ray, scene)
+        c.exit()
+        return color
+    return wrapper
+
+
+def _in_hierarchy(query: Callable) -> Callable:
+    @wraps(query)
+    def wrapper(bvh: BoundingVolumeHierarchy, ray: Ray):
+        c = _collector
+        c.hierarchy += 1
+        result = query(bvh, ray)
+        c.hierarchy -= 1
+        return result
+    return wrapper
+
+
+def _walk_node(walk_node: Callable) -> Callable:
+    @wraps(walk_node)
+    def wrapper(octree: Octree, node, *args):
+        _collector.stats.nodes_visited += 1
+        return walk_node(octree, node, *args)
+    return wrapper
+
+
+def _family(cls: type) -> List[type]:
+    # `cls` and all of its subclasses, each once
+    seen: Set[type] = set()
+    pending = [cls]
+    while pending:
+        c = pending.pop()
+        if c not in seen:
+            seen.add(c)
+            pending.extend(c.__subclasses__())
+    return list(seen)
+
+
+def _patch(owner: type, name: str, wrap: Callable) -> None:
+    original = vars(owner).get(name)
+    if original is None or getattr(original, "__isabstractmethod__", False):
+        return
+    _originals.append((owner, name, original))
+    setattr(owner, name, wrap(original))
+
+
+def start() -> RenderStats:
+    # the counters live in wrappers patched over the hot path and removed
+    # again by `stop`, so tracing without stats runs the untouched code
+    global _collector
+    if _collector is not None:
+        raise RuntimeError("render stats are already being collected")
+
+    _patch(Ray, "trace", _trace)
+    _patch(Scene, "occluded", _occluded)
+    _patch(Scene, "reflects", _reflects)
+    _patch(packet, "trace", _packet_trace)
+    _patch(packet, "shadow", _packet_shadow)
+    _patch(packet.Packet, "intersect", _packet_intersect)
+    for cls in _family(SceneObject):
+        _patch(cls, "intersect", _intersect)
+        _patch(cls, "shade", _shade)
+    for cls in _family(BoundingVolumeHierarchy):
+        _patch(cls, "trace", _in_hierarchy)
+        _patch(cls, "occluder", _in_hierarchy)
+        _patch(cls, "trace_packet", _in_hierarchy)
+        _patch(cls, "occlude_packet", _in_hierarchy)
+    _patch(BinaryBVH, "Stack", lambda _: _CountingStack)
+    _patch(Octree, "_Octree__walk_node", _walk_node)
+    _collector = _Collector()
+    return _collector.stats
+
+
+def stop() -> RenderStats:
+    global _collector
+    if _collector is None:
+        raise RuntimeError("render stats are not being collected")
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+    stats, _collector = _collector.finish(), None
+    return stats
+
+
+@contextmanager
+def collect() -> Generator[RenderStats, None, None]:
+    # the yielded stats are complete once the block exits
+    stats = start()
+    try:
+        yield stats
+    finally:
+        stop()
+
+
+def costed(trace_pixel: PixelTracer, costs: np.ndarray) -> PixelTracer:
+    # adds the counters every traced pixel (i, j) bumps to `costs[j, i]`;
+    # only counts while stats are being collected
+    @wraps(trace_pixel)
+    def wrapper(scene: Scene, origin, i: int, j: int, *args):
+        stats = _collector.stats
+        before = stats.cost()
+        color = trace_pixel(scene, origin, i, j, *args)
+        costs[j, i] += np.subtract(stats.cost(), before)
+        return color
+    return wrapper
+
+
+def heatmap(costs: np.ndarray) -> Image.Image:
+    # one channel per cost, each scaled to its own maximum: red for
+    # intersection tests, green for nodes visited, blue for secondary rays
+    peak = costs.max(axis=(0, 1)).astype(np.float64)
+    peak[peak == 0] = 1
+    rgb = (costs * (255 / peak)).astype(np.uint8)
+    return Image.fromarray(rgb, "RGB")
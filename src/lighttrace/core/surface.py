@@ -1,62 +1,75 @@
-from .constants import DELTA_SMALL
+from .constants import DELTA_SMALL, INFINITY
 from .ray import Ray
-from .types import AbstractSurface, CoefficientSet, Color, LightType, Point, RGBAPixel, Scene, Vector3
+from .types import AbstractSurface, CoefficientSet, Color, Light, LightType, Parameterized, Point, RGBAPixel, Scene, Vector3
+
+from typing import Dict
+
+class Surface(AbstractSurface, Parameterized):
+    parameters = ("color", )
 
-class Surface(AbstractSurface):
     def __init__(self, color: Color = None, coefficients: CoefficientSet = None) -> None:
-        self.color = color
+        self.color = self.bind("color", color)
         self.coefficients = coefficients
 
-    def shade(self, p: Point, v: Vector3, n: Vector3, scene: Scene) -> RGBAPixel:
-        color = Color()
+    # (ambient light, color, coefficients) -> the surface's ambient term
+    __ambient = (None, None, None, None)
+
+    def ambient(self, light: Color) -> Color:
+        # the surface under the scene's summed ambient `light`, worked out
+        # again only once either changes
+        cached = self.__ambient
+        if cached[0] is not light or cached[1] is not self.color or cached[2] is not self.coefficients:
+            cached = self.__ambient = (light, self.color, self.coefficients, self.color.mix(light * self.coefficients.ambient))
+        return cached[3]
+
+    def shade(self, p: Point, v: Vector3, n: Vector3, scene: Scene, time: float = 0.0, depth: int = 0, throughput: float = 1.0, shadows: Dict[Light, bool] = None) -> RGBAPixel:
         alpha = 1.0
         k = self.coefficients
-        for light in scene.lights:
-            if light.type == LightType.AMBIENT:
-                color += self.color.mix(light.color * k.ambient)
-            else:
-                intensity = 1.0
-                dsqr = float("inf")
-                if light.type == LightType.POINT:
-                    l = (light.direction - p)
-                    dsqr = l.dot(l)
-                    intensity = light.color.dot(light.color) / dsqr
-                    l = l.normalized
-                else:
-                    l = (light.direction * -1).normalized
+        lighting = scene.lighting
+        color = self.ambient(lighting.ambient)
+        for light, kind, lcolor, l, power, motion in lighting.lights:
+            intensity = 1.0
+            dsqr = INFINITY
+            if kind == LightType.POINT:
+                l = (l - p) if motion is None else (l + motion * time - p)
+                dsqr = l.dot(l)
+                intensity = power / dsqr
+                l = l.normalized
 
+            if shadows is not None:
+                blocked = shadows[light]
+            else:
                 shadowpoint = (p + l * DELTA_SMALL)
-                shadowray = Ray(shadowpoint, l)
+                shadowray = Ray(shadowpoint, l, time)
                 shadowray.t = dsqr**.5
+                blocked = scene.occluded(shadowray, light)
+            if blocked:
+                continue
 
-                if (shadowray.trace(scene)):
-                    continue
-
-                cos = n.dot(l)
-                if cos > 0:
-                    diffuse = k.diffuse * cos
-                    color += light.color * diffuse * intensity
+            cos = n.dot(l)
+            if cos > 0:
+                diffuse = k.diffuse * cos
+                color += lcolor * diffuse * intensity
 
-                if k.specular > 0:
-                    u = (2 * cos * n) - l
-                    specular = v.dot(u)
-                    if specular > 0:
-                        specular = k.specular * abs(specular)**2.2
-                        color += light.color * specular * intensity
+            if k.specular > 0:
+                u = (2 * cos * n) - l
+                specular = v.dot(u)
+                if specular > 0:
+                    specular = k.specular * abs(specular)**2.2
+                    color += lcolor * specular * intensity
         if k.reflect > 0:
             t = v.dot(n)
-            if t > 0:
+            if t > 0 and scene.reflects(depth + 1, throughput * k.reflect):
                 t *= 2
                 reflect = (n * t) - v
                 shadowpos = p + (reflect * DELTA_SMALL)
-                reflected_ray = Ray(shadowpos, reflect)
+                reflected_ray = Ray(shadowpos, reflect, time, depth + 1, throughput * k.reflect)
 
                 rcolor = scene.background
                 if reflected_ray.trace(scene):
                     rcolor = Color(*reflected_ray.shade(scene))
                 color += k.reflect * rcolor
 
-        color.truncate()
         return RGBAPixel(*color, alpha)
 
 
@@ -1,21 +1,43 @@
-from PIL import Image, ImageDraw
+from PIL import Image
 
 from .constants import OUTPUT_DIRECTORY
 from .ray import Ray
 from .types import Color, Scene, Vector3, Viewport
 from .volume import Octree
+from . import packet, parallel, progressive, stats, vectorized
+from .antialiasing import AdaptiveSampler, DEPTH, THRESHOLD
+from .parallel import CHANNELS, PixelTracer
+from .sinks import PNGSink, Sink, literal
+from .stats import RenderStats
 
-from typing import List
+from functools import partial
+from typing import Generator, List, Optional, Tuple
 from pathlib import Path
 
+import sys
+
+import numpy as np
+
 class Tracer:
-    def __init__(self, viewport: Viewport = None, scene: Scene = None, directory: str = None, filename: str = "output") -> None:
+    def __init__(self, viewport: Viewport = None, scene: Scene = None, directory: str = None, filename: str = "output", sink: Sink = None) -> None:
         self.viewport = viewport or Viewport()
         self.scene = scene or Scene()
-        print(self.scene.objects)
-        # self.scene.construct()
-        self.image = Image.new("RGB", (self.viewport.width, self.viewport.height))
-        self.draw = ImageDraw.Draw(self.image)
+        # diagnostics go to stderr, stdout may be carrying frames (StreamSink)
+        print(self.scene.objects, file=sys.stderr)
+        self.scene.construct()
+        # the last frame developed from the framebuffer
+        self.image: Optional[Image.Image] = None
+        # pixels accumulate unclamped in `framebuffer` and are only clamped
+        # into `__pixels` for output; both are reused by every frame
+        shape = (self.viewport.height, self.viewport.width, CHANNELS)
+        self.framebuffer = np.zeros(shape, dtype=np.float32)
+        self.__pixels = np.zeros(shape, dtype=np.uint8)
+        # counters from the last render(collect_stats=True)
+        self.stats: Optional[RenderStats] = None
+        # per-pixel stats.COSTS from the last render(heatmap=True)
+        self.costs: Optional[np.ndarray] = None
+        # seconds per pixel of the last render_parallel, to schedule the next
+        self.timings: Optional[np.ndarray] = None
 
         self.__dir = directory
         if self.__dir != None:
@@ -24,13 +46,17 @@ class Tracer:
             self.__filename = Path(f"{OUTPUT_DIRECTORY}/{self.__dir}/{filename}.png")
         else:
             self.__filename = Path(f"{OUTPUT_DIRECTORY}/{filename}.png")
+        # every finished frame goes to `sink`, numbered by `frame`; by default
+        # it overwrites the PNG at the tracer's filename
+        self.sink = sink or PNGSink(literal(str(self.__filename)))
+        self.frame = 0
 
     @staticmethod
     def print_progress(percent: float) -> None:
         percent = int(percent)
         if not int(percent) % 2 and percent > 0:
             bar = f'[{">" * (percent // 2)}>{" " * ((100 - percent) // 2)}]'
-            print(bar, end="\r")
+            print(bar, end="\r", file=sys.stderr)
 
     @staticmethod
     def compute_ray_directions(i: int, j: int, du: Vector3, dv: Vector3, vp: Vector3, antialiasing: bool = False):
@@ -61,22 +87,189 @@ class Tracer:
         for c in colors:
             res += c
         res = res * (1./len(colors))
-        res.truncate()
         return res
 
-    def render(self) -> None:
+    @staticmethod
+    def shutter_times(samples: int = 1) -> Tuple[float, ...]:
+        # stratified over the shutter; a single sample stays at shutter open
+        if samples <= 1:
+            return (0.0,)
+        return tuple((k + .5) / samples for k in range(samples))
+
+    @staticmethod
+    def trace_ray(scene: Scene, origin: Vector3, d: Vector3, time: float = 0.0) -> Color:
+        ray = Ray(origin, d, time)
+        if ray.trace(scene):
+            return Color(*ray.shade(scene))
+        return scene.background
+
+    @classmethod
+    def trace_shutter(cls, scene: Scene, origin: Vector3, d: Vector3, times: Tuple[float, ...] = (0.0,)) -> Color:
+        # trace_ray averaged over the shutter `times`
+        return cls.average_colors([cls.trace_ray(scene, origin, d, time) for time in times])
+
+    @classmethod
+    def sample_pixel(cls, scene: Scene, origin: Vector3, i: int, j: int, du: Vector3, dv: Vector3, vp: Vector3, times: Tuple[float, ...] = (0.0,)) -> Tuple[float, float, float]:
+        # the mean of the pixel's samples, not clamped to 255
+        r = g = b = 0.0
+        n = 0
+        for time in times:
+            for d in cls.compute_ray_directions(i, j, du, dv, vp):
+                color = cls.trace_ray(scene, origin, d, time)
+                r += color.i
+                g += color.j
+                b += color.k
+                n += 1
+        return r / n, g / n, b / n
+
+    @classmethod
+    def trace_pixel(cls, scene: Scene, origin: Vector3, i: int, j: int, du: Vector3, dv: Vector3, vp: Vector3, times: Tuple[float, ...] = (0.0,)) -> Color:
+        return Color(*cls.sample_pixel(scene, origin, i, j, du, dv, vp, times))
+
+    def render(
+        self,
+        antialiasing: bool = False,
+        threshold: float = THRESHOLD,
+        depth: int = DEPTH,
+        motion_samples: int = 1,
+        collect_stats: bool = False,
+        heatmap: bool = False,
+    ) -> Optional[RenderStats]:
+        # motion blur needs the scene set up with Scene.blur for this frame
+        if heatmap:
+            # adaptive samples are shared between neighbouring pixels, so
+            # their cost cannot be charged to any one of them
+            if antialiasing:
+                raise ValueError("a cost heatmap cannot be recorded with antialiasing")
+            self.costs = np.zeros((self.viewport.height, self.viewport.width, len(stats.COSTS)), dtype=np.int64)
+            with stats.collect() as self.stats:
+                self.render_pixels(stats.costed(self.sample_pixel, self.costs), motion_samples)
+            np.save(self.__filename.with_suffix(".cost.npy"), self.costs)
+            stats.heatmap(self.costs).save(self.__filename.with_suffix(".cost.png"), "PNG")
+            return self.stats
+
+        if collect_stats:
+            with stats.collect() as self.stats:
+                self.render(antialiasing=antialiasing, threshold=threshold, depth=depth, motion_samples=motion_samples)
+            return self.stats
+
+        if antialiasing:
+            self.render_adaptive(threshold=threshold, depth=depth, motion_samples=motion_samples)
+            return
+        self.render_pixels(self.sample_pixel, motion_samples)
+
+    def render_pixels(self, sample_pixel: PixelTracer, motion_samples: int = 1) -> None:
         width, height, du, dv, vp = self.viewport
         scene = self.scene
+        origin = self.viewport.origin
+        times = self.shutter_times(motion_samples)
+        framebuffer = self.framebuffer
         for j in range(height):
-            for i in range(width):
-                colors = []
-                for d in self.compute_ray_directions(i, j, du, dv, vp):
-                    ray = Ray(self.viewport.origin, d)
-                    if ray.trace(scene):
-                        colors.append(Color(*ray.shade(scene)))
-                    else:
-                        colors.append(scene.background)
-                self.draw.line([i,j, i, j], tuple(self.average_colors(colors)))
+            framebuffer[j] = [sample_pixel(scene, origin, i, j, du, dv, vp, times) for i in range(width)]
             percent = (float(j) / height) * 100
             self.print_progress(percent)
-        self.image.save(self.__filename, "PNG")
\ No newline at end of file
+        self.present()
+
+    @staticmethod
+    def clamp(framebuffer: np.ndarray, pixels: np.ndarray) -> np.ndarray:
+        # the one place colours are clamped to 0..255: on their way out of a
+        # float framebuffer into the 8-bit `pixels` of the output
+        return np.clip(framebuffer, 0, 255, out=pixels, casting="unsafe")
+
+    def develop(self) -> Image.Image:
+        # the framebuffer as an image, without outputting it
+        width, height = self.viewport.width, self.viewport.height
+        self.image = Image.frombuffer("RGB", (width, height), self.clamp(self.framebuffer, self.__pixels), "raw", "RGB", 0, 1)
+        return self.image
+
+    def present(self) -> None:
+        # clamp the framebuffer into the output image and send it to the sink
+        self.develop()
+        self.output()
+
+    def output(self) -> None:
+        self.sink.write(self.image, self.frame)
+        self.frame += 1
+
+    def close(self) -> None:
+        # waits for a threaded sink to write out every frame
+        self.sink.close()
+
+    def render_packets(self, size: int = packet.SIZE, motion_samples: int = 1) -> None:
+        # primary rays and their shadow rays are traced size x size pixels at
+        # a time, as packets; everything else follows single rays as usual
+        width, height, du, dv, vp = self.viewport
+        scene = self.scene
+        origin = self.viewport.origin
+        times = self.shutter_times(motion_samples)
+        framebuffer = self.framebuffer
+        framebuffer[:] = 0
+        tiles = list(parallel.iter_tiles(width, height, size))
+        for done, (x0, y0, x1, y1) in enumerate(tiles, 1):
+            pixels = [(i, j) for j in range(y0, y1) for i in range(x0, x1)]
+            for time in times:
+                rays = [Ray(origin, self.compute_ray_directions(i, j, du, dv, vp)[0], time) for i, j in pixels]
+                packet.trace(scene, rays)
+                hits = [ray for ray in rays if ray.object is not None]
+                if hits:
+                    packet.shadow(scene, hits)
+                colors = [Color(*ray.shade(scene)) if ray.object is not None else scene.background for ray in rays]
+                framebuffer[y0:y1, x0:x1] += np.array([tuple(c) for c in colors]).reshape(y1 - y0, x1 - x0, CHANNELS)
+            self.print_progress(done * 100 / len(tiles))
+        framebuffer /= len(times)
+        self.present()
+
+    def render_adaptive(self, threshold: float = THRESHOLD, depth: int = DEPTH, motion_samples: int = 1) -> None:
+        # one ray per pixel, then recursive supersampling of high-contrast pixels only;
+        # with motion blur every sample is itself averaged over the shutter
+        trace_ray = self.trace_ray
+        if motion_samples > 1:
+            trace_ray = partial(self.trace_shutter, times=self.shutter_times(motion_samples))
+        sampler = AdaptiveSampler(self.viewport, self.scene, trace_ray, threshold=threshold, depth=depth)
+        framebuffer = self.framebuffer
+        for j, row in enumerate(sampler.render(progress=self.print_progress)):
+            framebuffer[j] = [(c.i, c.j, c.k) for c in row]
+        self.present()
+
+    def render_progressive(
+        self,
+        budget: float = None,
+        samples: int = None,
+        stride: int = progressive.STRIDE,
+        motion_samples: int = 1,
+    ) -> Generator[Image.Image, None, None]:
+        # yields the framebuffer after every pass, coarse to fine; stops early
+        # once `budget` seconds or `samples` traced pixels are used up. the
+        # image is output however the generator ends, including when closed.
+        try:
+            for _ in progressive.render(
+                self.viewport,
+                self.scene,
+                partial(self.trace_pixel, times=self.shutter_times(motion_samples)),
+                self.framebuffer,
+                budget=budget,
+                samples=samples,
+                stride=stride,
+            ):
+                yield self.develop()
+        finally:
+            self.present()
+
+    def render_parallel(self, workers: int = None, tile_size: int = 32, motion_samples: int = 1) -> None:
+        # tiles are split and ordered by the cost they had in the previous
+        # render_parallel of this tracer, or by a pre-pass on the first one
+        self.timings = parallel.render(
+            self.viewport,
+            self.scene,
+            partial(self.trace_pixel, times=self.shutter_times(motion_samples)),
+            self.framebuffer,
+            workers=workers,
+            tile_size=tile_size,
+            progress=self.print_progress,
+            costs=self.timings,
+        )
+        self.present()
+
+    def render_vectorized(self) -> None:
+        _, _, self.framebuffer[:] = vectorized.render(self.viewport, self.scene)
+        self.present()
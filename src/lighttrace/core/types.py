@@ -1,10 +1,15 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import IntEnum
+from itertools import count
 from math import tan, pi
-from typing import Any, Callable, Generic, List, NamedTuple, Optional, Set, Tuple, TypeVar, Union
+from typing import Any, Callable, Dict, Generic, List, NamedTuple, Optional, Set, Tuple, TypeVar, Union
 
-from .constants import DELTA_SMALL, INFINITY 
+from .constants import CUTOFF, DELTA_SMALL, INFINITY, MAX_DEPTH
+
+import sys
+
+import numpy as np
 
 
 L = TypeVar("L")
@@ -37,21 +42,34 @@ class Scalar(float):
         return self.__value
 
 
+def identity(v: T, *args, **kwargs) -> T:
+    return v
+
+
 PARAMETER_REGISTRY = {}
+# registry keys are handed out in creation order: two parameters with the same
+# range and function are still distinct, and a key survives pickling
+PARAMETER_KEYS = count()
 class Parameter:
     def __init__(self, start: T, stop: T = 0, steps: int = 1, function: Callable[[T], T] = None):
         self.__start = start
         self.__stop = stop
         self.__value = start
+        self.__steps = steps
         self.__delta = (stop - start) / steps
         self.__observers = []
-        self.__function = function or self.__identity
+        self.__function = function or identity
         self.__result = self.__function(self.__value)
-        PARAMETER_REGISTRY[hash(self)] = self
+        self.__key = next(PARAMETER_KEYS)
+        PARAMETER_REGISTRY[self.__key] = self
 
-    @staticmethod
-    def __identity(v: T, *args, **kwargs) -> T:
-        return v
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        PARAMETER_REGISTRY[self.__key] = self
+
+    @property
+    def key(self) -> int:
+        return self.__key
 
     def rewind(self) -> None:
         self.__value = self.__start
@@ -60,12 +78,35 @@ class Parameter:
         self.__observers.append((observer, attr))
         return self
 
+    def value_at(self, frame: int) -> T:
+        return self.__start + self.__delta * min(frame, self.__steps)
+
+    def at(self, frame: int) -> T:
+        return self.__function(self.value_at(frame))
+
+    def sample(self, frames: Union[int, List[int], np.ndarray]) -> np.ndarray:
+        # all of `frames` in one go; an int means every frame up to it
+        frames = np.arange(frames) if isinstance(frames, int) else np.asarray(frames)
+        values = self.__start + self.__delta * np.minimum(frames, self.__steps)
+        try:
+            result = np.asarray(self.__function(values), dtype=float)
+        except (TypeError, ValueError):
+            # functions that only take scalars
+            result = np.array([self.__function(v) for v in values.tolist()], dtype=float)
+        return np.broadcast_to(result, values.shape)
+
+    def set(self, value: T) -> None:
+        self.__value = value
+        self.__result = self.__function(value)
+        for observer, attr in self.__observers:
+            observer.update_parameter(attr, self.__result)
+
     def __next__(self) -> float:
         if abs(self.__value - self.__stop) > DELTA_SMALL:
-            self.__value += self.__delta
-            self.__result = self.__function(self.__value)
-            for observer, attr in self.__observers:
-                observer.update_parameter(attr, self.__result)
+            # the next frame is evaluated directly rather than accumulated,
+            # so no rounding error builds up over a long animation
+            frame = round((self.__value - self.__start) / self.__delta)
+            self.set(self.value_at(frame + 1))
         return self.__result
 
     def __call__(self) -> float:
@@ -84,35 +125,41 @@ StaticParameter = lambda v: Parameter(v, v)
 
 class Parameterized:
     parameters: List[str]
+    __watchers: Tuple[Callable[["Parameterized"], None], ...] = ()
+    # animated values this object is bound to; only held so they (and their
+    # parameters) travel with the object when it is pickled
+    __bindings: Tuple["AnimatedThreeSpace", ...] = ()
+
+    def watch(self, callback: Callable[["Parameterized"], None]) -> None:
+        self.__watchers = self.__watchers + (callback,)
+
     def update_parameter(self, attr: str, value: T):
         setattr(self, attr, value)
+        for callback in self.__watchers:
+            callback(self)
+
+    def bind(self, attr: str, value: T) -> T:
+        if isinstance(value, AnimatedThreeSpace):
+            self.__bindings = self.__bindings + (value,)
+            return value.add_observer(self, attr).value
+        return value
+
 
+class ThreeSpace(Generic[T]):
+    # immutable, so the value-based hash holds: components are only written
+    # once, by __init__ through the slot descriptors
+    __slots__ = ("i", "j", "k")
 
-class ThreeSpace(Generic[T], Parameterized):
     def __init__(self, i: Optional[T] = 0, j: Optional[T] = 0, k: Optional[T] = 0, scalar: Optional[Scalar] = 0) -> None:
-        self.parameters = []
-        if isinstance(i, Parameter):
-            self.__i = i.add_observer(self, "i")
-            self.i = i()
-            self.parameters.append("i")
-        else:
-            self.i = i
-        if isinstance(j, Parameter):
-            self.__j = j.add_observer(self, "j")
-            self.j = j()
-            self.parameters.append("j")
-        else:
-            self.j = j  
-        if isinstance(k, Parameter):
-            self.__k = k.add_observer(self, "k")
-            self.k = k()
-            self.parameters.append("k")
-        else:
-            self.k = k
+        _set_i(self, i)
+        _set_j(self, j)
+        _set_k(self, k)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
 
-        self.mag = self.dot(self)**.5
-        self._normalized = None
-        self.__inverse = None
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
 
     def __add__(self, other: Generic[T]) -> Generic[T]:
         return self.__class__(self.i + other.i, self.j + other.j, self.k + other.k)
@@ -120,47 +167,31 @@ class ThreeSpace(Generic[T], Parameterized):
     def __radd__(self, other: Generic[T]) -> Generic[T]:
         return self.__add__(other)
 
-    def __iadd__(self, other: Generic[T]) -> Generic[T]:
-        self.i += other.i
-        self.j += other.j
-        self.k += other.k
-        return self
-
     def __sub__(self, other: Generic[T]) -> Generic[T]:
         return self.__class__(self.i - other.i, self.j - other.j, self.k - other.k)
 
     def __rsub__(self, other: Generic[T]) -> Generic[T]:
         return self.__sub__(other)
 
-    def __isub__(self, other: Generic[T]) -> Generic[T]:
-        self.i -= other.i
-        self.j -= other.j
-        self.k -= other.k
-        return self
-
     def __mul__(self, s: float) -> Generic[T]:
         return self.__class__(self.i * s, self.j * s, self.k * s)
 
     def __rmul__(self, s: float) -> Generic[T]:
         return self.__mul__(s)
 
-    def __imul__(self, other: Generic[T]) -> Generic[T]:
-        self.i *= other.i
-        self.j *= other.j
-        self.k *= other.k
-        return self
-
-    def __div__(self, s: float) -> Generic[T]:
+    def __truediv__(self, s: float) -> Generic[T]:
         return self.__class__(self.i / s, self.j / s, self.k / s)
 
-    def __rdiv__(self, s: float) -> Generic[T]:
-        return self.__div__(s)
+    def __neg__(self) -> Generic[T]:
+        return self.__class__(-self.i, -self.j, -self.k)
 
-    def __idiv__(self, s: float) -> Generic[T]:
-        self.i /= s
-        self.j /= s
-        self.k /= s
-        return self
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ThreeSpace):
+            return NotImplemented
+        return self.i == other.i and self.j == other.j and self.k == other.k
+
+    def __hash__(self) -> int:
+        return hash((self.i, self.j, self.k))
 
     def __getitem__(self, idx: int) -> T:
         if idx == 0:
@@ -172,29 +203,48 @@ class ThreeSpace(Generic[T], Parameterized):
         raise IndexError("3-Spaces do not have index > 2")
 
     def __len__(self):
-        return self.mag
+        return 3
 
     def __iter__(self):
         yield self.i
         yield self.j
         yield self.k
 
+    def __reduce__(self):
+        return (self.__class__, (self.i, self.j, self.k))
+
     def dot(self, other: Generic[T]) -> T:
         return (
             self.i * other.i + self.j * other.j + self.k * other.k
         )
 
+    @property
+    def mag(self) -> T:
+        return (self.i * self.i + self.j * self.j + self.k * self.k)**.5
+
+    @property
+    def size(self):
+        return self.mag
+
+    @property
+    def normalized(self) -> Generic[T]:
+        mag = (self.i * self.i + self.j * self.j + self.k * self.k)**.5
+        return self.__class__(self.i / mag, self.j / mag, self.k / mag)
+
     @property
     def inverse(self) -> Generic[T]:
-        if self.__inverse is None:
-            ii = 1 / self.i if self.i else INFINITY
-            ij = 1 / self.j if self.j else INFINITY
-            ik = 1 / self.k if self.k else INFINITY
-            self.__inverse = Vector3(ii, ij, ik)
-        return self.__inverse
+        ii = 1 / self.i if self.i else INFINITY
+        ij = 1 / self.j if self.j else INFINITY
+        ik = 1 / self.k if self.k else INFINITY
+        return Vector3(ii, ij, ik)
+
+
+_set_i, _set_j, _set_k = ThreeSpace.i.__set__, ThreeSpace.j.__set__, ThreeSpace.k.__set__
 
 
 class Point(ThreeSpace):
+    __slots__ = ()
+
     def __repr__(self) -> str:
         return f"<Point i={self.i}, j={self.j}, k={self.k}>"
 
@@ -203,6 +253,8 @@ class Point(ThreeSpace):
 
 
 class Color(ThreeSpace):
+    __slots__ = ()
+
     def mix(self, other: ThreeSpace) -> ThreeSpace:
         return Color(self.i * other.i, self.j * other.j, self.k * other.k)
 
@@ -232,14 +284,13 @@ class Color(ThreeSpace):
 
     @property
     def normalized(self) -> Generic[T]:
-        if self.mag > 0:
-            return self * (1.0 / self.mag)
+        mag = self.mag
+        if mag > 0:
+            return self * (1.0 / mag)
         return self
 
-    def truncate(self):
-        self.i = int(min(self.i, 255))
-        self.j = int(min(self.j, 255))
-        self.k = int(min(self.k, 255))
+    def truncate(self) -> "Color":
+        return Color(int(min(self.i, 255)), int(min(self.j, 255)), int(min(self.k, 255)))
 
     def __repr__(self) -> str:
         return f"Color({self.i}, {self.j}, {self.k})"
@@ -249,6 +300,8 @@ class Color(ThreeSpace):
 
 
 class Vector3(ThreeSpace):
+    __slots__ = ()
+
     def __repr__(self) -> str:
         return f"<Vector i={self.i}, j={self.j}, k={self.k}>"
 
@@ -262,22 +315,62 @@ class Vector3(ThreeSpace):
             k=(self.i * other.j - other.i * self.j)
         )
 
-    def scale(self, v: float) -> None:
-        self.i *= v
-        self.j *= v
-        self.k *= v
+    def scale(self, v: float) -> Generic[T]:
+        return self * v
 
-    @property
-    def size(self):
-        return self.mag
+Vector = Vector3
 
-    @property
-    def normalized(self) -> Generic[T]:
-        if self._normalized is None:
-            self._normalized = Vector3(self.i / self.mag, self.j / self.mag, self.k / self.mag)
-        return self._normalized
 
-Vector = Vector3
+class AnimatedThreeSpace(Parameterized):
+    kind = ThreeSpace
+
+    def __init__(self, i: Union[T, Parameter] = 0, j: Union[T, Parameter] = 0, k: Union[T, Parameter] = 0) -> None:
+        self.parameters = []
+        self.__observers = []
+        # held on to so the parameters travel with the object when pickled
+        self.__sources = []
+        for attr, v in (("i", i), ("j", j), ("k", k)):
+            if isinstance(v, Parameter):
+                v.add_observer(self, attr)
+                self.parameters.append(attr)
+                self.__sources.append(v)
+                v = v()
+            setattr(self, attr, v)
+        self.value = self.kind(self.i, self.j, self.k)
+
+    def add_observer(self, observer: Parameterized, attr: str) -> "AnimatedThreeSpace":
+        self.__observers.append((observer, attr))
+        return self
+
+    def update_parameter(self, attr: str, value: T):
+        setattr(self, attr, value)
+        self.value = self.kind(self.i, self.j, self.k)
+        for observer, observer_attr in self.__observers:
+            observer.update_parameter(observer_attr, self.value)
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} value={self.value!r}, parameters={self.parameters}>"
+
+
+class AnimatedPoint(AnimatedThreeSpace):
+    kind = Point
+
+
+class AnimatedColor(AnimatedThreeSpace):
+    kind = Color
+
+
+class AnimatedVector3(AnimatedThreeSpace):
+    kind = Vector3
+
+
+def resolve(v: Union[ThreeSpace, AnimatedThreeSpace]) -> ThreeSpace:
+    if isinstance(v, AnimatedThreeSpace):
+        return v.value
+    return v
 
 @dataclass
 class AbstractRay:
@@ -312,17 +405,63 @@ class LightType(IntEnum):
 
 class Light(Parameterized):
     parameters = ("direction", )
+    # displacement of a point light over the shutter, see Scene.blur
+    motion: Optional[Vector3] = None
 
     def __init__(self, kind: LightType = LightType.AMBIENT, color: Color = None, direction: Vector3 = None) -> None:
         self.type = kind
-        self.color = color
-        self.direction = direction
-        if self.type == LightType.DIRECTIONAL:
-            self.direction = self.direction.normalized
+        self.color = self.bind("color", color)
+        self.update_parameter("direction", self.bind("direction", direction))
+
+    def update_parameter(self, attr: str, value: T):
+        if attr == "direction" and self.type == LightType.DIRECTIONAL:
+            value = value.normalized
+        super().update_parameter(attr, value)
+
+
+# a non-ambient light as shading uses it: `vector` is the unit direction
+# towards a directional light, or where a point light is at the start of
+# the shutter; `power` is the squared magnitude of its colour
+PreparedLight = NamedTuple(
+    "PreparedLight",
+    [
+        ("light", Light),
+        ("type", LightType),
+        ("color", Color),
+        ("vector", Vector3),
+        ("power", float),
+        ("motion", Optional[Vector3]),
+    ]
+)
+
+
+class Lighting(NamedTuple):
+    # the scene's lights, prepared once per frame rather than on every hit;
+    # the ambient lights are summed into one colour
+    ambient: Color
+    lights: Tuple[PreparedLight, ...]
+
+    @classmethod
+    def of(cls, lights: List[Light]) -> "Lighting":
+        ambient = Color()
+        prepared = []
+        for light in lights:
+            if light.type == LightType.AMBIENT:
+                ambient += light.color
+            elif light.type == LightType.POINT:
+                power = light.color.dot(light.color)
+                prepared.append(PreparedLight(light, light.type, light.color, light.direction, power, light.motion))
+            else:
+                l = (light.direction * -1).normalized
+                prepared.append(PreparedLight(light, light.type, light.color, l, 1.0, None))
+        return cls(ambient, tuple(prepared))
 
 
 class SceneObject(ABC):
     attrs = tuple()
+    # displacement of the object's center over the shutter interval, set
+    # while a motion-blurred frame is rendered
+    motion: Optional["Vector3"] = None
 
     @abstractmethod
     def intersect(self, ray: Vector3) -> bool:
@@ -343,6 +482,9 @@ class SceneObject(ABC):
     def bounds(self) -> Tuple[Bounds]:
         raise NotImplementedError()
 
+    def bounds_at(self, time: float) -> Tuple[Bounds]:
+        return self.bounds
+
     @property
     def centroid(self) -> Point:
         if self._type == BoundsType.FINITE:
@@ -367,6 +509,39 @@ class BoundingVolumeHierarchy(ABC):
     def get_candidates(self, ray: Any) -> Set[SceneObject]:
         raise NotImplementedError()
 
+    def refit(self, objects: List[SceneObject]) -> bool:
+        # hierarchies that cannot be updated in place ask for a rebuild
+        return False
+
+    def move(self, objects: List[SceneObject]) -> bool:
+        # hierarchies that cannot follow `objects` across the shutter leave
+        # them to be tested against every ray
+        return False
+
+    def occluder(self, ray: Any) -> Optional[SceneObject]:
+        for candidate in self.get_candidates(ray):
+            if candidate.intersect(ray):
+                return candidate
+        return None
+
+    def trace(self, ray: Any) -> bool:
+        obj = ray.object
+        for candidate in self.get_candidates(ray):
+            candidate.intersect(ray)
+        return ray.object is not obj
+
+    def trace_packet(self, packet: Any) -> None:
+        # hierarchies without packet traversal trace its rays one by one
+        for k in range(len(packet)):
+            ray = packet.ray(k)
+            if self.trace(ray):
+                packet.t[k] = ray.t
+
+    def occlude_packet(self, packet: Any) -> None:
+        for k in range(len(packet)):
+            if not packet.done[k] and self.occluder(packet.ray(k)) is not None:
+                packet.done[k] = True
+
 
 @dataclass
 class Scene(Generic[L, S]):
@@ -375,16 +550,124 @@ class Scene(Generic[L, S]):
     background: Color = Color(0, 0, 0)
     bvh_factory: Callable[[List[SceneObject]], BoundingVolumeHierarchy] = None
     bvh: BoundingVolumeHierarchy = None
+    max_depth: int = MAX_DEPTH
+    cutoff: float = CUTOFF
+
+    def __post_init__(self):
+        self.__dirty = {}
+        self.__stale = True
+        self.__size = 0
+        self.__occluders = {}
+        self.__moving = []
+        self.__unbounded_moving = set()
+        self.__lighting = None
+        for item in self.lights + self.objects:
+            self.__watch(item)
+
+    def __watch(self, item: Union[Light, SceneObject]) -> None:
+        if isinstance(item, Parameterized):
+            item.watch(self.mark_dirty)
+
+    def mark_dirty(self, item: Union[Light, SceneObject]) -> None:
+        # keyed by id: an object's hash follows its (now changed) attributes
+        self.__dirty[id(item)] = item
+        if isinstance(item, Light):
+            self.__lighting = None
 
     def construct(self):
-        self.bvh = self.bvh_factory(self.objects)
+        # objects appended to `objects` directly bypass `add`
+        self.__stale = self.__stale or len(self.objects) != self.__size
+        self.__size = len(self.objects)
+        if self.__stale or self.__dirty:
+            self.__hold_still()
+        if self.__stale:
+            self.__unbounded_objects = {o for o in self.objects if not o.is_finite}
+        if self.bvh_factory is not None:
+            moved = [o for o in self.__dirty.values() if isinstance(o, SceneObject) and o.is_finite]
+            if self.__stale or self.bvh is None:
+                self.bvh = self.bvh_factory([o for o in self.objects if o.is_finite])
+            elif moved and not self.bvh.refit(moved):
+                self.bvh = self.bvh_factory([o for o in self.objects if o.is_finite])
+        self.__stale = False
+        self.__dirty.clear()
+
+    @staticmethod
+    def __position(item: Union[Light, SceneObject]) -> ThreeSpace:
+        return item.direction if isinstance(item, Light) else item.center
+
+    def __hold_still(self) -> None:
+        for item in self.__moving:
+            item.motion = None
+        self.__moving = []
+        self.__unbounded_moving = set()
+        self.__lighting = None
+        if self.bvh is not None:
+            self.bvh.move([])
+
+    def blur(self, start: Dict[int, Any], end: Dict[int, Any]) -> None:
+        # set up a motion-blurred frame: the scene is left at `start` (shutter
+        # open) and every light and object that moves before `end` (shutter
+        # closed) carries its displacement, which rays evaluate at their time
+        self.restore(end)
+        moving = list(self.__dirty.values())
+        ends = [self.__position(item) for item in moving]
+        self.restore(start)
+        self.construct()
+
+        for item, position in zip(moving, ends):
+            motion = position - self.__position(item)
+            if motion.dot(motion):
+                item.motion = motion
+                self.__moving.append(item)
+        self.__lighting = None
+        finite = [o for o in self.__moving if isinstance(o, SceneObject) and o.is_finite]
+        if self.bvh is not None and not self.bvh.move(finite):
+            self.__unbounded_moving = self.__unbounded_objects | set(finite)
+
+    def occluded(self, ray: Any, light: Light = None) -> bool:
+        # shadow rays only need any hit closer than `ray.t`: the object that
+        # last blocked this light is the most likely blocker, so test it first
+        last = self.__occluders.get(light)
+        if last is not None and last.intersect(ray):
+            return True
+
+        blocker = None
+        if self.bvh is None:
+            candidates = self.objects
+        else:
+            blocker = self.bvh.occluder(ray)
+            candidates = self.unbounded_objects
+        if blocker is None:
+            blocker = next((o for o in candidates if o.intersect(ray)), None)
+        if blocker is not None and light is not None:
+            self.__occluders[light] = blocker
+        return blocker is not None
+
+    @property
+    def lighting(self) -> Lighting:
+        # rebuilt once a light moves or changes; lights appended to `lights`
+        # directly bypass `add`
+        lighting = self.__lighting
+        if lighting is None or self.__lit != len(self.lights):
+            lighting = self.__lighting = Lighting.of(self.lights)
+            self.__lit = len(self.lights)
+        return lighting
+
+    def reflects(self, depth: int, throughput: float) -> bool:
+        # whether a reflection ray `depth` bounces deep, carrying `throughput`
+        # of its pixel's colour, is worth tracing
+        return depth <= self.max_depth and throughput >= self.cutoff
 
     def add(self, *items: Union[Light, SceneObject]) -> None:
         for item in items:
             if isinstance(item, Light):
                 self.lights.append(item)
+                self.__watch(item)
+                self.__lighting = None
             elif isinstance(item, SceneObject):
                 self.objects.append(item)
+                self.__watch(item)
+                self.__stale = True
             else:
                 raise TypeError(
                     "cannot add item that is neither an instance of a subclass of Light nor SceneObject"
@@ -400,9 +683,21 @@ class Scene(Generic[L, S]):
     
     @property
     def unbounded_objects(self) -> Set[SceneObject]:
+        if self.bvh is not None:
+            return self.__unbounded_moving or self.__unbounded_objects
         return {o for o in self.objects if not o.is_finite}
 
 
+    def snapshot(self, frame: int) -> Dict[int, Any]:
+        # every parameter's value at `frame`, without stepping through the
+        # frames before it or touching the current state
+        return {key: p.value_at(frame) for key, p in PARAMETER_REGISTRY.items()}
+
+    def restore(self, snapshot: Dict[int, Any]) -> None:
+        for key, value in snapshot.items():
+            if key in PARAMETER_REGISTRY:
+                PARAMETER_REGISTRY[key].set(value)
+
     def __next__(self):
         global PARAMETER_REGISTRY
         for p in PARAMETER_REGISTRY.values():
@@ -427,13 +722,13 @@ class Animation:
         return self
 
     def __exit__(self, *args):
-        print(*args)
+        print(*args, file=sys.stderr)
         return True
 
 
 class AbstractSurface(ABC):
     @abstractmethod
-    def shade(self, p: Point, v: Vector3, n: Vector3, scene: Scene) -> RGBAPixel:
+    def shade(self, p: Point, v: Vector3, n: Vector3, scene: Scene, time: float = 0.0, depth: int = 0, throughput: float = 1.0, shadows: Dict["Light", bool] = None) -> RGBAPixel:
         raise NotImplementedError()
 
 
@@ -449,6 +744,7 @@ class Viewport:
         focus: Vector3 = None,
         fov: float = 90.0
     ) -> None:
+        self.__arguments = (width, height, origin, up, focus, fov)
         self.width = width
         self.height = height
         if origin is None:
@@ -459,15 +755,19 @@ class Viewport:
         if focus is None:
             focus = Vector3(0, 0, 1)
 
-        self.origin = origin
-        self.up = up
-        self.focus = focus
+        self.origin = resolve(origin)
+        self.up = resolve(up)
+        self.focus = resolve(focus)
         self.fov = width / (2 * (tan(0.5 * fov * pi / 180)))
 
         self.__look: Vector3 = None
         self.__basis: OrthonormalBasis = None
         self.__viewpoint: Point = None
 
+    def current(self) -> "Viewport":
+        # a fresh viewport from the current values of any animated arguments
+        return Viewport(*self.__arguments)
+
     @property
     def look(self) -> Vector3:
         if self.__look is None:
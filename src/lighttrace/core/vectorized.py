@@ -0,0 +1,242 @@
+from .constants import DELTA_SMALL, HORIZON, INFINITY
+from .geometry import Plane, Polygon, Sphere
+from .types import LightType, Scene, Viewport
+
+from collections import defaultdict
+from typing import Tuple
+
+import numpy as np
+
+MISS = -1
+CHUNK_SIZE = 1 << 20
+
+
+def normalize(v: np.ndarray) -> np.ndarray:
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum("...k,...k->...", a, b)
+
+
+def cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.stack(
+        [
+            a[..., 1] * b[..., 2] - b[..., 1] * a[..., 2],
+            -(a[..., 0] * b[..., 2] - b[..., 0] * a[..., 2]),
+            a[..., 0] * b[..., 1] - b[..., 0] * a[..., 1],
+        ],
+        axis=-1,
+    )
+
+
+def camera_rays(viewport: Viewport) -> Tuple[np.ndarray, np.ndarray]:
+    width, height, du, dv, vp = viewport
+    i, j = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+    i, j = i.reshape(-1, 1), j.reshape(-1, 1)
+    directions = i * np.array(tuple(du)) + j * np.array(tuple(dv)) + np.array(tuple(vp))
+    origins = np.broadcast_to(np.array(tuple(viewport.origin), dtype=np.float64), directions.shape)
+    return origins, normalize(directions)
+
+
+def _chunks(n: int, m: int):
+    step = max(1, CHUNK_SIZE // max(1, n))
+    for start in range(0, m, step):
+        yield start, min(m, start + step)
+
+
+def intersect_spheres(o: np.ndarray, d: np.ndarray, centers: np.ndarray, radii: np.ndarray, tmax: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(o)
+    t_best = np.full(n, INFINITY)
+    i_best = np.full(n, MISS, dtype=np.int64)
+    for start, stop in _chunks(n, len(centers)):
+        ca = centers[None, start:stop] - o[:, None]
+        v = dot(ca, d[:, None])
+        r = radii[None, start:stop]
+        disc = r * r + v * v - dot(ca, ca)
+        with np.errstate(invalid="ignore"):
+            t = v - np.sqrt(disc)
+        t = np.where((disc >= 0) & (t >= 0) & (t <= tmax[:, None]), t, INFINITY)
+        _keep_nearest(t, start, t_best, i_best)
+    return t_best, i_best
+
+
+def intersect_planes(o: np.ndarray, d: np.ndarray, centers: np.ndarray, normals: np.ndarray, tmax: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(o)
+    t_best = np.full(n, INFINITY)
+    i_best = np.full(n, MISS, dtype=np.int64)
+    for start, stop in _chunks(n, len(centers)):
+        nrm = normals[None, start:stop]
+        cos = dot(d[:, None], nrm)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = dot(centers[None, start:stop] - o[:, None], nrm) / cos
+        t = np.where((cos != 0) & (t > 0) & (t <= tmax[:, None]), t, INFINITY)
+        _keep_nearest(t, start, t_best, i_best)
+    return t_best, i_best
+
+
+def intersect_polygons(o: np.ndarray, d: np.ndarray, vertices: np.ndarray, normals: np.ndarray, tmax: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # vertices is (M, k, 3): every polygon in one batch shares a vertex count
+    n = len(o)
+    t_best = np.full(n, INFINITY)
+    i_best = np.full(n, MISS, dtype=np.int64)
+    k = vertices.shape[1]
+    for start, stop in _chunks(n * k, len(vertices)):
+        verts = vertices[start:stop]
+        nrm = normals[None, start:stop]
+        cos = dot(d[:, None], nrm)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = -dot(o[:, None] - verts[None, :, 0], nrm) / cos
+        hit = (cos != 0) & (t >= 0) & (t < tmax[:, None])
+        x = o[:, None] + d[:, None] * np.where(hit, t, 0)[..., None]
+        for e in range(k):
+            a = verts[None, :, e]
+            ab = verts[None, :, (e + 1) % k] - a
+            hit &= dot(cross(ab, x - a), nrm) >= 0
+        t = np.where(hit, t, INFINITY)
+        _keep_nearest(t, start, t_best, i_best)
+    return t_best, i_best
+
+
+def _keep_nearest(t: np.ndarray, offset: int, t_best: np.ndarray, i_best: np.ndarray) -> None:
+    idx = np.argmin(t, axis=1)
+    t = t[np.arange(len(t)), idx]
+    closer = t < t_best
+    t_best[closer] = t[closer]
+    i_best[closer] = idx[closer] + offset
+
+
+class PackedScene:
+    def __init__(self, scene: Scene) -> None:
+        self.scene = scene
+        self.objects = scene.objects
+        spheres, planes = [], []
+        polygons = defaultdict(list)
+        for idx, o in enumerate(self.objects):
+            if isinstance(o, Sphere):
+                spheres.append(idx)
+            elif isinstance(o, Plane):
+                planes.append(idx)
+            elif isinstance(o, Polygon):
+                polygons[len(o.vertices)].append(idx)
+            else:
+                raise TypeError(f"cannot vectorize intersections for {o.__class__.__name__}")
+
+        objects = self.objects
+        self.sphere_index = np.array(spheres, dtype=np.int64)
+        self.sphere_centers = np.array([tuple(objects[i].center) for i in spheres], dtype=np.float64).reshape(-1, 3)
+        self.sphere_radii = np.array([objects[i].radius for i in spheres], dtype=np.float64)
+
+        self.plane_index = np.array(planes, dtype=np.int64)
+        self.plane_centers = np.array([tuple(objects[i].center) for i in planes], dtype=np.float64).reshape(-1, 3)
+        self.plane_normals = np.array([tuple(objects[i].normal) for i in planes], dtype=np.float64).reshape(-1, 3)
+
+        self.polygon_batches = []
+        for k, members in polygons.items():
+            self.polygon_batches.append((
+                np.array(members, dtype=np.int64),
+                np.array([[tuple(v) for v in objects[i].vertices] for i in members], dtype=np.float64).reshape(-1, k, 3),
+                np.array([tuple(objects[i].normal) for i in members], dtype=np.float64).reshape(-1, 3),
+            ))
+
+        self.colors = np.array([tuple(o.surface.color) for o in objects], dtype=np.float64).reshape(-1, 3)
+        self.coefficients = np.array([tuple(o.surface.coefficients) for o in objects], dtype=np.float64).reshape(-1, 5)
+
+    def intersect(self, o: np.ndarray, d: np.ndarray, tmax: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        t_best = np.array(tmax, dtype=np.float64)
+        i_best = np.full(len(o), MISS, dtype=np.int64)
+        kernels = []
+        if len(self.sphere_index):
+            kernels.append((intersect_spheres, self.sphere_index, (self.sphere_centers, self.sphere_radii)))
+        if len(self.plane_index):
+            kernels.append((intersect_planes, self.plane_index, (self.plane_centers, self.plane_normals)))
+        for index, vertices, normals in self.polygon_batches:
+            kernels.append((intersect_polygons, index, (vertices, normals)))
+
+        for kernel, index, args in kernels:
+            t, i = kernel(o, d, *args, t_best)
+            hit = i != MISS
+            t_best[hit] = t[hit]
+            i_best[hit] = index[i[hit]]
+        return t_best, i_best
+
+    def normals(self, p: np.ndarray, index: np.ndarray) -> np.ndarray:
+        n = np.empty_like(p)
+        for idx in np.unique(index):
+            mask = index == idx
+            o = self.objects[idx]
+            if isinstance(o, Sphere):
+                n[mask] = normalize(p[mask] - np.array(tuple(o.center)))
+            else:
+                n[mask] = np.array(tuple(o.normal))
+        return n
+
+
+def trace(packed: PackedScene, o: np.ndarray, d: np.ndarray, tmax: float = HORIZON) -> Tuple[np.ndarray, np.ndarray]:
+    return packed.intersect(o, d, np.full(len(o), tmax))
+
+
+def shade(packed: PackedScene, o: np.ndarray, d: np.ndarray, t: np.ndarray, index: np.ndarray, depth: int = 0, throughput: np.ndarray = None) -> np.ndarray:
+    # `depth` and `throughput` are those of the rays, as in Scene.reflects
+    scene = packed.scene
+    if throughput is None:
+        throughput = np.ones(len(o))
+    p = o + d * t[:, None]
+    v = -d
+    n = packed.normals(p, index)
+    surface_color = packed.colors[index]
+    ambient, specular, diffuse, _, reflect = packed.coefficients[index].T
+
+    color = np.zeros_like(p)
+    for light in scene.lights:
+        light_color = np.array(tuple(light.color), dtype=np.float64)
+        if light.type == LightType.AMBIENT:
+            color += surface_color * (light_color * ambient[:, None])
+            continue
+
+        if light.type == LightType.POINT:
+            l = np.array(tuple(light.direction)) - p
+            dsqr = dot(l, l)
+            intensity = light_color.dot(light_color) / dsqr
+            l = normalize(l)
+        else:
+            l = np.broadcast_to(normalize(-np.array(tuple(light.direction), dtype=np.float64)), p.shape)
+            dsqr = np.full(len(p), INFINITY)
+            intensity = np.ones(len(p))
+
+        _, blocker = packed.intersect(p + l * DELTA_SMALL, l, dsqr**.5)
+        lit = blocker == MISS
+
+        cos = dot(n, l)
+        lambert = lit & (cos > 0)
+        color[lambert] += light_color * (diffuse * cos * intensity)[lambert, None]
+
+        s = dot(v, 2 * cos[:, None] * n - l)
+        highlight = lit & (specular > 0) & (s > 0)
+        color[highlight] += light_color * (specular * np.abs(s)**2.2 * intensity)[highlight, None]
+
+    t_reflect = dot(v, n)
+    carried = throughput * reflect
+    mirror = (reflect > 0) & (t_reflect > 0) & (carried >= scene.cutoff)
+    if depth + 1 <= scene.max_depth and mirror.any():
+        r = n[mirror] * (2 * t_reflect[mirror])[:, None] - v[mirror]
+        ro, rd = p[mirror] + r * DELTA_SMALL, normalize(r)
+        rt, ri = trace(packed, ro, rd)
+        rcolor = np.broadcast_to(np.array(tuple(scene.background), dtype=np.float64), ro.shape).copy()
+        hit = ri != MISS
+        if hit.any():
+            rcolor[hit] = shade(packed, ro[hit], rd[hit], rt[hit], ri[hit], depth + 1, carried[mirror][hit])
+        color[mirror] += reflect[mirror, None] * rcolor
+
+    return color
+
+
+def render(viewport: Viewport, scene: Scene) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    packed = PackedScene(scene)
+    o, d = camera_rays(viewport)
+    t, index = trace(packed, o, d)
+    rgb = np.broadcast_to(np.array(tuple(scene.background), dtype=np.float64), o.shape).copy()
+    hit = index != MISS
+    rgb[hit] = shade(packed, o[hit], d[hit], t[hit], index[hit])
+    shape = (viewport.height, viewport.width)
+    return t.reshape(shape), index.reshape(shape), rgb.reshape(*shape, 3)
@@ -3,10 +3,11 @@ from dataclasses import dataclass
 from .constants import INFINITY
 from .ray import Ray
 from .types import BoundingVolumeHierarchy, Bounds, IntersectionResult, Point, Scene, SceneObject, Vector3
-from .utils import step
 
 from collections import defaultdict
-from typing import Generator, List, NamedTuple, Set, TypeVar
+from typing import Generator, List, NamedTuple, Optional, Set, Tuple, TypeVar
+
+import sys
 
 T = TypeVar("T")
 Volume = NamedTuple("Volume", [("i", Bounds), ("j", Bounds), ("k", Bounds)])
@@ -34,6 +35,24 @@ class Volume:
         return (d0 + d1) >= d_sep
 
 
+    def overlaps(self, v: Volume) -> bool:
+        return (
+            self.i.min <= v.i.max and v.i.min <= self.i.max and
+            self.j.min <= v.j.max and v.j.min <= self.j.max and
+            self.k.min <= v.k.max and v.k.min <= self.k.max
+        )
+
+    def slab(self, anchor: Point, inverse: Vector3) -> Tuple[float, float]:
+        ti_0 = (self.i.min - anchor.i) * inverse.i
+        ti_1 = (self.i.max - anchor.i) * inverse.i
+        tj_0 = (self.j.min - anchor.j) * inverse.j
+        tj_1 = (self.j.max - anchor.j) * inverse.j
+        tk_0 = (self.k.min - anchor.k) * inverse.k
+        tk_1 = (self.k.max - anchor.k) * inverse.k
+        tmin = max(min(ti_0, ti_1), min(tj_0, tj_1), min(tk_0, tk_1))
+        tmax = min(max(ti_0, ti_1), max(tj_0, tj_1), max(tk_0, tk_1))
+        return tmin, tmax
+
     @property
     def halfdiagonal(self):
         c = centroid_of_bounds(self)
@@ -118,6 +137,10 @@ class OctreeNode:
         (True, False, False): 6,
         (False, False, False): 7
     }
+    # a node is split while it holds more than LEAF_OBJECTS objects and is
+    # larger than LEAF_SIZE; tune against a cost heatmap from Tracer.render
+    LEAF_OBJECTS = 1
+    LEAF_SIZE = 10
 
     def __init__(self, volume: Volume, objects: List[SceneObject] = None) -> None:
         self.objects = objects or []
@@ -139,41 +162,23 @@ class OctreeNode:
         ]
 
     def intersect(self, ray: Ray) -> IntersectionResult:
-        v = self.volume
-
-        pi, pj, pk = ray.anchor
-        ri, rj, rk = ray.direction
-        ti_0 = (v.i.min - pi) * ri
-        ti_1 = (v.i.max - pi) * ri
-
-        tmin, tmax = max(ti_0, ti_1), max(ti_0, ti_1)
-
-        tj_0 = (v.j.min - pj) * rj
-        tj_1 = (v.j.max - pj) * rj
-
-        tmin, tmax = max(tmin, min(tj_0, tj_1)), max(tmax, max(tj_0, tj_1))
-
-        tk_0 = (v.k.min - pk) * rk
-        tk_1 = (v.k.max - pk) * rk
-
-        tmin, tmax = max(tmin, min(tk_0, tk_1)), max(tmax, max(tk_0, tk_1))
-
+        tmin, tmax = self.volume.slab(ray.anchor, ray.direction.inverse)
         return IntersectionResult(tmax >= max(0, tmin), tmin=tmin, tmax=tmax, r=ray)
 
     def split(self) -> None:
-        if len(self.objects) > 1 and self.volume.size > 10:
+        if len(self.objects) > self.LEAF_OBJECTS and self.volume.size > self.LEAF_SIZE:
             octants = self.construct_octants()
             octant_members = defaultdict(list)
             for o in self.objects:
                 for i, octant in enumerate(octants):
-                    if octant.intersects_volume(Volume(*o.bounds)):
+                    if octant.overlaps(Volume(*o.bounds)):
                         octant_members[i].append(o)
             for i, octant in enumerate(octants):
                 self.octants.append(OctreeNode(octant, objects=octant_members[i]))
         else:
             global counter
             counter += 1
-            print(f"Constructing octree: {counter}      ", end="\r")
+            print(f"Constructing octree: {counter}      ", end="\r", file=sys.stderr)
 
 
     @property
@@ -202,9 +207,9 @@ class OctreeNode:
 class Octree(BoundingVolumeHierarchy):
     def __init__(self, objects: List[SceneObject]) -> None:
         global counter
-        print(f"Constructing octree: {counter}     ", end="\r")
+        print(f"Constructing octree: {counter}     ", end="\r", file=sys.stderr)
         self.__root = OctreeNode(get_bounding_cube([o.bounds for o in objects]), objects=objects)
-        print("\ndone!")
+        print("\ndone!", file=sys.stderr)
         counter = 0
 
     @property
@@ -221,12 +226,130 @@ class Octree(BoundingVolumeHierarchy):
     def find(self, point: Point) -> OctreeNode:
         return self.__root.find(point)
     
+    def walk(self, ray: Ray) -> Generator[Tuple[OctreeNode, float], None, None]:
+        # parametric traversal (Revelles et al.): yields the leaves the ray
+        # crosses, in order, with the distance at which the ray enters each.
+        # axes with a negative direction are mirrored about the root centre so
+        # the state machine only handles positive directions; `mirror` maps the
+        # octant numbering back (bit 4: upper i, 2: upper j, 1: upper k).
+        v = tuple(self.__root.volume)
+        o, d = ray.anchor, ray.direction
+        origin, direction, mirror = [], [], 0
+        for axis, bit in ((0, 4), (1, 2), (2, 1)):
+            b = v[axis]
+            if d[axis] < 0:
+                origin.append(b.min + b.max - o[axis])
+                direction.append(-d[axis])
+                mirror |= bit
+            else:
+                origin.append(o[axis])
+                direction.append(d[axis])
+
+        t0, t1 = [], []
+        for axis in range(3):
+            b = v[axis]
+            inverse = 1 / direction[axis] if direction[axis] else INFINITY
+            t0.append((b.min - origin[axis]) * inverse)
+            t1.append((b.max - origin[axis]) * inverse)
+
+        if max(t0) < min(t1):
+            yield from self.__walk_node(self.__root, *t0, *t1, ray, mirror)
+
+    @staticmethod
+    def __first_octant(tx0: float, ty0: float, tz0: float, txm: float, tym: float, tzm: float) -> int:
+        octant = 0
+        if tx0 > ty0 and tx0 > tz0:
+            if tym < tx0:
+                octant |= 2
+            if tzm < tx0:
+                octant |= 1
+        elif ty0 > tz0:
+            if txm < ty0:
+                octant |= 4
+            if tzm < ty0:
+                octant |= 1
+        else:
+            if txm < tz0:
+                octant |= 4
+            if tym < tz0:
+                octant |= 2
+        return octant
+
+    @staticmethod
+    def __next_octant(tx: float, x: int, ty: float, y: int, tz: float, z: int) -> int:
+        if tx < ty:
+            return x if tx < tz else z
+        return y if ty < tz else z
+
+    @staticmethod
+    def __midpoint(t0: float, t1: float, o: float, c: float) -> float:
+        if t0 == -INFINITY and t1 == INFINITY:
+            return INFINITY if o < c else -INFINITY
+        return 0.5 * (t0 + t1)
+
+    def __walk_node(self, node, tx0, ty0, tz0, tx1, ty1, tz1, ray, mirror):
+        if tx1 < 0 or ty1 < 0 or tz1 < 0:
+            return
+        if not node.octants:
+            yield node, max(tx0, ty0, tz0)
+            return
+
+        c = node.centroid
+        txm = self.__midpoint(tx0, tx1, ray.anchor.i, c.i)
+        tym = self.__midpoint(ty0, ty1, ray.anchor.j, c.j)
+        tzm = self.__midpoint(tz0, tz1, ray.anchor.k, c.k)
+
+        octant = self.__first_octant(tx0, ty0, tz0, txm, tym, tzm)
+        while octant < 8:
+            real = octant ^ mirror
+            child = node.octants[OctreeNode.INDEX_LOOKUP[(bool(real & 4), bool(real & 2), bool(real & 1))]]
+            if octant == 0:
+                yield from self.__walk_node(child, tx0, ty0, tz0, txm, tym, tzm, ray, mirror)
+                octant = self.__next_octant(txm, 4, tym, 2, tzm, 1)
+            elif octant == 1:
+                yield from self.__walk_node(child, tx0, ty0, tzm, txm, tym, tz1, ray, mirror)
+                octant = self.__next_octant(txm, 5, tym, 3, tz1, 8)
+            elif octant == 2:
+                yield from self.__walk_node(child, tx0, tym, tz0, txm, ty1, tzm, ray, mirror)
+                octant = self.__next_octant(txm, 6, ty1, 8, tzm, 3)
+            elif octant == 3:
+                yield from self.__walk_node(child, tx0, tym, tzm, txm, ty1, tz1, ray, mirror)
+                octant = self.__next_octant(txm, 7, ty1, 8, tz1, 8)
+            elif octant == 4:
+                yield from self.__walk_node(child, txm, ty0, tz0, tx1, tym, tzm, ray, mirror)
+                octant = self.__next_octant(tx1, 8, tym, 6, tzm, 5)
+            elif octant == 5:
+                yield from self.__walk_node(child, txm, ty0, tzm, tx1, tym, tz1, ray, mirror)
+                octant = self.__next_octant(tx1, 8, tym, 7, tz1, 8)
+            elif octant == 6:
+                yield from self.__walk_node(child, txm, tym, tz0, tx1, ty1, tzm, ray, mirror)
+                octant = self.__next_octant(tx1, 8, ty1, 8, tzm, 7)
+            else:
+                yield from self.__walk_node(child, txm, tym, tzm, tx1, ty1, tz1, ray, mirror)
+                octant = 8
+
+    def trace(self, ray: Ray) -> bool:
+        obj = ray.object
+        for leaf, t in self.walk(ray):
+            if ray.t < t:
+                break
+            for o in leaf.objects:
+                o.intersect(ray)
+        return ray.object is not obj
+
+    def occluder(self, ray: Ray) -> Optional[SceneObject]:
+        for leaf, t in self.walk(ray):
+            if ray.t < t:
+                break
+            for o in leaf.objects:
+                if o.intersect(ray):
+                    return o
+        return None
+
     def get_candidates(self, ray: Ray) -> Set[SceneObject]:
-        ir = self.intersect(ray)
         c = set()
-        for t in step(ir.tmin, ir.tmax, (ir.tmax - ir.tmin) / 100):
-            p = ray.anchor + (ray.direction * t)
-            c = {*c, *self.find(p).objects}
-        return c   
-
-
+        for leaf, t in self.walk(ray):
+            if ray.t < t:
+                break
+            c.update(leaf.objects)
+        return c
@@ -1,10 +1,22 @@
 from lighttrace.core.types import Point, Vector3
 from lighttrace.core.geometry import Sphere
+from lighttrace.core.bvh import BinaryBVH
+from lighttrace.core.mesh import Mesh
+from lighttrace.core.progressive import iter_passes
+from lighttrace.core.tracer import Tracer
 from lighttrace.core.ray import Ray
 from lighttrace.core.volume import Octree
 
+from benchmark import orbit
+
+from collections import Counter
 from pprint import pprint
 from random import randint
+from tempfile import TemporaryDirectory
+
+import os
+
+import numpy as np
 
 
 def random_point(n = 10) -> Point:
@@ -21,6 +33,70 @@ def test_octree() -> None:
     print(octree.get_candidates(ray))
 
 
+def test_mixed_face_formats() -> None:
+    # `v/vt` and `v//vn` faces in one chunk have as many indices each
+    obj = b"""v 0 0 0
+v 1 0 0
+v 0 1 0
+vt 0 0
+vt 1 0
+vt 0 1
+vn 0 0 1
+vn 0 0 -1
+f 1/1 2/2 3/3
+f 1//2 2//2 3//2
+"""
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "mixed.obj")
+        with open(path, "wb") as f:
+            f.write(obj)
+        mesh = Mesh(None)
+        mesh.read(path, cache=False)
+    assert mesh.indices.tolist() == [[0, 1, 2], [0, 1, 2]]
+    assert mesh.texcoord_indices.tolist() == [[0, 1, 2], [-1, -1, -1]]
+    assert mesh.normal_indices.tolist() == [[-1, -1, -1], [1, 1, 1]]
+
+
+def test_vectors_are_immutable() -> None:
+    # vectors hash by value, so they must not change once in a set
+    v = Vector3(1, 2, 3)
+    seen = {v}
+    try:
+        v.i = 9
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("Vector3 components can be reassigned")
+    assert v in seen
+
+
+def test_progressive_passes_partition_the_image() -> None:
+    for stride in (1, 2, 3, 5, 6, 8, 12):
+        traced = Counter((i, j) for blocks in iter_passes(16, 13, stride) for i, j, _ in blocks)
+        assert set(traced) == {(i, j) for j in range(13) for i in range(16)}, stride
+        assert set(traced.values()) == {1}, stride
+
+
+def test_progressive_matches_render() -> None:
+    scene, viewport = orbit(1, BinaryBVH, 16)
+    tracer = Tracer(viewport, scene, directory="test")
+    tracer.render()
+    expected = np.asarray(tracer.image)
+    for stride in (3, 6, 8):
+        for _ in tracer.render_progressive(stride=stride):
+            pass
+        assert (np.asarray(tracer.image) == expected).all(), stride
+
+    # a budgeted preview starts from black, not from the last frame, and
+    # yields once for the pass it cut short
+    previews = list(tracer.render_progressive(samples=1))
+    assert len(previews) == 1
+    assert (np.asarray(previews[0])[8:, 8:] == 0).all()
+
 
 if __name__ == "__main__":
-    test_octree()
\ No newline at end of file
+    test_octree()
+    test_mixed_face_formats()
+    test_vectors_are_immutable()
+    test_progressive_passes_partition_the_image()
+    test_progressive_matches_render()
\ No newline at end of file